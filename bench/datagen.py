@@ -0,0 +1,75 @@
+import csv
+import random
+from datetime import datetime, timedelta
+
+SEED_MENU_CSV = "data/menu.csv"
+ORDER_TYPES = ("Dine-In", "Takeaway")
+PAYMENT_METHODS = ("Cash", "Card", "UPI")
+
+
+def load_seed_menu(path=SEED_MENU_CSV):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [
+            (row['name'].strip(), row.get('category', '').strip(),
+             float(row.get('price', 0)), float(row.get('gst_percent', 0)))
+            for row in csv.DictReader(f)
+        ]
+
+
+def generate_menu(conn, size=500, seed_path=SEED_MENU_CSV, rng=None):
+    """Fill the menu with `size` items derived from the seed CSV (replaces existing rows)."""
+    rng = rng or random.Random(42)
+    seed = load_seed_menu(seed_path)
+    rows = []
+    for i in range(size):
+        name, category, price, gst = seed[i % len(seed)]
+        if i >= len(seed):
+            name = f"{name} #{i // len(seed)}"
+            price = round(price * rng.uniform(0.8, 1.5), 2)
+        rows.append((name, category, price, gst, 1 if rng.random() < 0.8 else 0))
+    with conn:
+        conn.execute("DELETE FROM menu")
+        conn.executemany(
+            "INSERT INTO menu (name, category, price, gst_percent, available_today) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+    return [r[0] for r in conn.execute("SELECT id FROM menu ORDER BY id")]
+
+
+def generate_orders(conn, n_orders, days=365, max_items=8, rng=None, chunk=20000, end=None):
+    """Insert n_orders synthetic orders (with order_items) spread over `days` days ending today.
+
+    Rows are written in chunks of `chunk` orders per transaction. Order ids
+    are allocated up front from MAX(id) so items can be bulk-inserted too.
+    """
+    rng = rng or random.Random(7)
+    menu = conn.execute("SELECT id, price FROM menu").fetchall()
+    if not menu:
+        raise ValueError("menu is empty; run generate_menu first")
+    end = end or datetime.now()
+    span = days * 86400
+    next_id = (conn.execute("SELECT IFNULL(MAX(id), 0) FROM orders").fetchone()[0]) + 1
+    written = 0
+    while written < n_orders:
+        count = min(chunk, n_orders - written)
+        orders, items = [], []
+        for order_id in range(next_id, next_id + count):
+            subtotal = 0.0
+            for _ in range(rng.randint(1, max_items)):
+                item_id, price = menu[rng.randrange(len(menu))]
+                qty = rng.randint(1, 4)
+                subtotal += price * qty
+                items.append((order_id, item_id, qty))
+            gst = round(subtotal * 0.05, 2)
+            created = end - timedelta(seconds=rng.randrange(span))
+            orders.append((order_id, rng.choice(ORDER_TYPES), rng.choice(PAYMENT_METHODS),
+                           round(subtotal + gst, 2), gst, 0.0, created.strftime("%Y-%m-%d %H:%M:%S")))
+        with conn:
+            conn.executemany(
+                "INSERT INTO orders (id, order_type, payment_method, total_amount, gst_amount, discount, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", orders
+            )
+            conn.executemany("INSERT INTO order_items (order_id, item_id, quantity) VALUES (?, ?, ?)", items)
+        next_id += count
+        written += count
+    return written
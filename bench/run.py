@@ -0,0 +1,212 @@
+"""Time the billing hot paths against a synthetic scratch database.
+
+    python -m bench.run --orders 1000000 --json bench/results.json --csv bench/history.csv
+    python -m bench.run --orders 100000 --compare bench/results.json
+
+The scratch database is built once (use --rebuild to regenerate it) and
+never touches db/restaurant.db. Results are written as JSON (one run) and
+appended to a CSV (run history); --compare exits non-zero if any hot path's
+p50 latency regressed by more than --threshold percent.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bench.datagen import generate_menu, generate_orders
+from utils import db_pool
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "restaurant_bench.db")
+
+
+def time_op(fn, iterations, warmup=3):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+
+    def pct(p):
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000
+
+    total = sum(samples)
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.fmean(samples) * 1000, 4),
+        'p50_ms': round(pct(50), 4),
+        'p95_ms': round(pct(95), 4),
+        'p99_ms': round(pct(99), 4),
+        'ops_per_sec': round(iterations / total, 1) if total else None,
+    }
+
+
+def prepare_db(path, n_orders, menu_size, rebuild=False):
+    from utils.db_utils import setup_tables
+
+    if rebuild and os.path.exists(path):
+        os.remove(path)
+    db_pool.set_db_path(path)
+    setup_tables()
+    conn = db_pool.get_connection()
+    existing = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    if conn.execute("SELECT COUNT(*) FROM menu").fetchone()[0] < menu_size or existing == 0:
+        generate_menu(conn, menu_size)
+    if existing < n_orders:
+        generate_orders(conn, n_orders - existing)
+    return conn
+
+
+def sample_orders(conn, count, rng):
+    from utils.repository import list_menu
+
+    menu = [
+        {'id': it.id, 'name': it.name, 'price': it.price, 'gst_percent': it.gst_percent, 'quantity': 1}
+        for it in list_menu(available_only=True, conn=conn)
+    ]
+    orders = []
+    for _ in range(count):
+        items = []
+        for it in rng.sample(menu, min(len(menu), rng.randint(1, 12))):
+            items.append(dict(it, quantity=rng.randint(1, 4)))
+        orders.append(items)
+    return orders
+
+
+def run_benchmarks(conn, iterations, selected=None):
+    from utils.calculator import calculate_bill
+    from utils.menu_cache import menu_cache
+    from utils.order_writer import build_order, save_order, write_orders
+    from utils.sales_rollup import get_sales_for_day
+
+    rng = random.Random(1)
+    orders = sample_orders(conn, 256, rng)
+    pick = lambda: orders[rng.randrange(len(orders))]
+    bill = calculate_bill(orders[0])
+
+    def load_menu():
+        menu_cache.invalidate()
+        menu_cache.refresh()
+
+    def load_menu_one_change():
+        menu_cache.invalidate(orders[0][0]['id'])
+        menu_cache.refresh()
+
+    def save_batch():
+        write_orders([build_order("Dine-In", "Cash", bill, pick()) for _ in range(50)])
+
+    cases = {
+        'calculate_bill': (lambda: calculate_bill(pick(), 5.0, 2.0), iterations * 10),
+        'save_order': (lambda: save_order("Dine-In", "Cash", bill, pick()), iterations),
+        'save_order_batch50': (save_batch, max(1, iterations // 10)),
+        'get_daily_sales': (lambda: get_sales_for_day(conn.cursor()), iterations * 10),
+        'load_menu_for_billing': (load_menu, iterations),
+        'load_menu_incremental': (load_menu_one_change, iterations),
+    }
+    try:
+        from utils.pdf_generator import generate_pdf_bill
+        import reportlab  # noqa: F401
+    except ImportError:
+        generate_pdf_bill = None
+    if generate_pdf_bill is not None:
+        out_dir = tempfile.mkdtemp(prefix="bench_bills_")
+        path = os.path.join(out_dir, "bench_bill.pdf")
+        cases['generate_pdf_bill'] = (
+            lambda: generate_pdf_bill(pick(), bill, filename=path, open_after=False), max(1, iterations // 5))
+
+    results = []
+    for name, (fn, n) in cases.items():
+        if selected and name not in selected:
+            continue
+        stats = time_op(fn, n)
+        stats['name'] = name
+        results.append(stats)
+        print(f"{name:24s} p50={stats['p50_ms']:.4f}ms p95={stats['p95_ms']:.4f}ms "
+              f"p99={stats['p99_ms']:.4f}ms {stats['ops_per_sec']} ops/s")
+    if generate_pdf_bill is None and (not selected or 'generate_pdf_bill' in selected):
+        print("generate_pdf_bill        skipped (reportlab not installed)")
+    return results
+
+
+def write_csv(path, meta, results):
+    new = not os.path.exists(path)
+    with open(path, "a", newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if new:
+            writer.writerow(["run_at", "label", "orders", "name", "iterations",
+                             "mean_ms", "p50_ms", "p95_ms", "p99_ms", "ops_per_sec"])
+        for r in results:
+            writer.writerow([meta['run_at'], meta['label'], meta['orders'], r['name'], r['iterations'],
+                             r['mean_ms'], r['p50_ms'], r['p95_ms'], r['p99_ms'], r['ops_per_sec']])
+
+
+def compare(baseline_path, results, threshold):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+    regressions = []
+    for r in results:
+        old = baseline.get(r['name'])
+        if not old or not old['p50_ms']:
+            continue
+        change = (r['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{r['name']:24s} p50 {old['p50_ms']:.4f} -> {r['p50_ms']:.4f} ms ({change:+.1f}%){flag}")
+        if flag:
+            regressions.append(r['name'])
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark billing hot paths")
+    parser.add_argument("--db", default=DEFAULT_DB, help="scratch database path")
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--menu-size", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--only", nargs="*", help="run only these hot paths")
+    parser.add_argument("--rebuild", action="store_true", help="regenerate the scratch database")
+    parser.add_argument("--label", default="")
+    parser.add_argument("--json", dest="json_path")
+    parser.add_argument("--csv", dest="csv_path")
+    parser.add_argument("--compare", help="baseline JSON from a previous run")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed p50 regression in percent")
+    args = parser.parse_args(argv)
+
+    if os.path.abspath(args.db) == os.path.abspath("db/restaurant.db"):
+        parser.error("refusing to benchmark against the live database")
+
+    start = time.perf_counter()
+    conn = prepare_db(args.db, args.orders, args.menu_size, args.rebuild)
+    print(f"scratch db ready in {time.perf_counter() - start:.1f}s: {args.db}")
+
+    meta = {
+        'run_at': datetime.now().isoformat(timespec="seconds"),
+        'label': args.label,
+        'orders': args.orders,
+        'menu_size': args.menu_size,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    }
+    results = run_benchmarks(conn, args.iterations, args.only)
+    if args.json_path:
+        with open(args.json_path, "w", encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+    if args.csv_path:
+        write_csv(args.csv_path, meta, results)
+    if args.compare and compare(args.compare, results, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
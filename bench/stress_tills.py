@@ -0,0 +1,165 @@
+"""Run N simulated tills as separate processes against one scratch database.
+
+    python -m bench.stress_tills --tills 8 --orders 500
+    python -m bench.stress_tills --tills 16 --orders 200 --menu-every 25 --json bench/stress.json
+
+Every till rings up random orders through BillingService and checks out
+(BEGIN IMMEDIATE with busy-timeout retries). Till 0 also acts as the
+manager, flipping an item's availability every --menu-every orders. The
+other tills pick those flips up through the menu change log. At the end
+the script checks that every checkout is stored exactly once and that the
+daily_sales rollup agrees with the orders table. It exits non-zero on any
+lost order, lock error or mismatch.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "restaurant_stress.db")
+
+
+def till(index, db_path, n_orders, menu_every, seed, results):
+    from utils import db_pool, repository
+    from utils.billing_service import BillingService
+    from utils.menu_cache import menu_cache
+    from utils.menu_watch import MenuChangeWatcher
+
+    db_pool.set_db_path(db_path)
+    rng = random.Random(seed)
+    service = BillingService()
+    watcher = MenuChangeWatcher()
+    stats = {'till': index, 'orders': 0, 'items': 0, 'unavailable': 0, 'menu_writes': 0,
+             'menu_changes_seen': 0, 'errors': [], 'latencies': []}
+    menu_cache.refresh()
+    all_ids = [it.id for it in menu_cache.all_items()]
+    for n in range(n_orders):
+        stats['menu_changes_seen'] += len(watcher.poll())
+        if index == 0 and menu_every and n % menu_every == 0:
+            repository.set_available_today(rng.choice(all_ids), rng.random() < 0.7)
+            stats['menu_writes'] += 1
+        available = menu_cache.available()
+        sid = service.open_session()
+        try:
+            for item in rng.sample(available, min(len(available), rng.randint(1, 6))):
+                try:
+                    service.add_item(sid, item_id=item.id, quantity=rng.randint(1, 3))
+                except ValueError:
+                    stats['unavailable'] += 1
+            if not service.get_session(sid).order:
+                continue
+            lines = len(service.get_session(sid).order)
+            start = time.perf_counter()
+            service.checkout(sid, rng.choice(("Dine-In", "Takeaway")), rng.choice(("Cash", "Card", "UPI")))
+            stats['latencies'].append(time.perf_counter() - start)
+            stats['orders'] += 1
+            stats['items'] += lines
+        except sqlite3.OperationalError as e:
+            stats['errors'].append(str(e))
+        finally:
+            service.close_session(sid)
+    results.put(stats)
+
+
+def prepare(db_path, menu_size, rebuild):
+    from bench.run import prepare_db
+    from utils import db_pool
+
+    if rebuild:
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    conn = prepare_db(db_path, 0, menu_size, rebuild)
+    with conn:
+        conn.execute("UPDATE menu SET available_today = 1")
+    orders_before = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    db_pool.close_all()     # each till opens its own connections
+    return orders_before
+
+
+def check(db_path, orders_before, tills):
+    from utils import db_pool
+
+    conn = db_pool.get_connection(db_path)
+    orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] - orders_before
+    rollup = conn.execute("SELECT IFNULL(SUM(total_orders), 0) FROM daily_sales").fetchone()[0]
+    stored = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    checked_out = sum(t['orders'] for t in tills)
+    problems = []
+    if orders != checked_out:
+        problems.append(f"{checked_out} checkouts but {orders} new orders stored")
+    if rollup != stored:
+        problems.append(f"daily_sales counts {rollup} orders, orders table has {stored}")
+    errors = sum(len(t['errors']) for t in tills)
+    if errors:
+        problems.append(f"{errors} checkouts failed with lock errors")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress one database with N till processes")
+    parser.add_argument("--db", default=DEFAULT_DB, help="scratch database path")
+    parser.add_argument("--tills", type=int, default=8)
+    parser.add_argument("--orders", type=int, default=300, help="orders per till")
+    parser.add_argument("--menu-size", type=int, default=200)
+    parser.add_argument("--menu-every", type=int, default=20, help="till 0 edits the menu every N orders (0 = never)")
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args(argv)
+
+    if os.path.abspath(args.db) == os.path.abspath("db/restaurant.db"):
+        parser.error("refusing to stress the live database")
+
+    orders_before = prepare(args.db, args.menu_size, args.rebuild)
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=till, args=(i, args.db, args.orders, args.menu_every, i, results))
+             for i in range(args.tills)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    tills = []
+    while len(tills) < len(procs):
+        try:
+            tills.append(results.get(timeout=1))
+        except queue.Empty:
+            if not any(p.is_alive() for p in procs) and results.empty():
+                break
+    for p in procs:
+        p.join()
+    if len(tills) < len(procs):
+        print(f"{len(procs) - len(tills)} till(s) crashed", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(s for t in tills for s in t['latencies'])
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000 if latencies else 0.0
+    total = sum(t['orders'] for t in tills)
+    summary = {
+        'tills': args.tills,
+        'orders': total,
+        'seconds': round(elapsed, 2),
+        'orders_per_sec': round(total / elapsed, 1),
+        'checkout_p50_ms': round(pct(50), 3),
+        'checkout_p99_ms': round(pct(99), 3),
+        'checkout_max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        'menu_writes': sum(t['menu_writes'] for t in tills),
+        'menu_changes_seen': {t['till']: t['menu_changes_seen'] for t in sorted(tills, key=lambda t: t['till'])},
+        'lock_errors': sum(len(t['errors']) for t in tills),
+    }
+    summary['problems'] = check(args.db, orders_before, tills)
+    print(json.dumps(summary, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary['problems'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
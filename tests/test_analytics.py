@@ -0,0 +1,37 @@
+import threading
+
+from utils import analytics, db_pool
+from utils.migrations import migrate
+from utils.order_writer import build_order, write_orders
+
+BILL = {'total': 105.0, 'gst': 5.0, 'discount': 0.0}
+
+
+def test_concurrent_refreshes_fold_each_order_once(tmp_path):
+    path = str(tmp_path / "analytics.db")
+    migrate(path)
+    items = [{'id': 1, 'name': "Tea", 'category': "Beverage", 'price': 100.0, 'quantity': 1}]
+    write_orders([build_order("Dine-In", "Cash", BILL, items, "2025-01-01 10:00:00") for _ in range(400)],
+                 db_pool.get_connection(path))
+
+    start = threading.Barrier(4)
+    errors = []
+
+    def till():
+        try:
+            conn = db_pool.get_connection(path)
+            start.wait()
+            analytics.refresh(conn, chunk=1)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=till) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    quantity = db_pool.get_connection(path).execute(
+        "SELECT SUM(quantity) FROM item_sales_hourly WHERE item_id = 1").fetchone()[0]
+    assert quantity == 400
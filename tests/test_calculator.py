@@ -0,0 +1,28 @@
+import pytest
+
+from utils.calculator import bills_to_columns, calculate_bill, calculate_bills_bulk
+
+BILLS = [
+    {'order_id': 1, 'discount_percent': 10.0, 'items': [
+        {'price': 180.0, 'quantity': 2, 'gst_percent': None},
+        {'price': 90.0, 'quantity': 1, 'gst_percent': 18.0},
+    ]},
+    {'order_id': 2, 'items': [
+        {'price': 40.0, 'quantity': 3},
+        {'price': 250.0, 'quantity': 1, 'gst_percent': None},
+    ]},
+]
+
+
+def test_bulk_matches_calculate_bill_with_missing_rates():
+    pytest.importorskip("numpy")
+    bulk = calculate_bills_bulk(*bills_to_columns(BILLS, gst_percent=12.0))
+    for i, bill in enumerate(BILLS):
+        expected = calculate_bill(bill['items'], 12.0, bill.get('discount_percent', 0.0))
+        for key in ("subtotal", "gst", "discount", "total"):
+            assert bulk[key][i] == expected[key]
+
+
+def test_columns_use_default_for_missing_rates():
+    rates = bills_to_columns(BILLS, gst_percent=12.0)[3]
+    assert rates == [12.0, 18.0, 12.0, 12.0]
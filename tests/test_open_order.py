@@ -0,0 +1,24 @@
+from utils.calculator import calculate_bill
+from utils.open_order import OpenOrder
+
+ITEMS = [
+    {'id': 1, 'name': "Paneer Tikka", 'category': "Snacks", 'price': 180.0, 'gst_percent': None},
+    {'id': 2, 'name': "Cold Coffee", 'category': "Beverage", 'price': 90.0, 'gst_percent': 18.0},
+    {'id': 3, 'name': "Naan", 'category': "Bread", 'price': 40.0, 'gst_percent': None},
+]
+
+
+def test_default_gst_change_mid_order_matches_calculate_bill():
+    order = OpenOrder(default_gst_percent=5.0)
+    order.add(ITEMS[0], 2)
+    order.add(ITEMS[1], 1)
+    assert order.totals() == calculate_bill(order.items(), 5.0)
+
+    order.default_gst_percent = 12.0
+    order.add(ITEMS[2], 3)
+    assert order.totals(10) == calculate_bill(order.items(), 12.0, 10)
+
+    order.default_gst_percent = 18.0    # same rate as the line that carries its own
+    order.set_quantity(1, 1)
+    assert order.totals() == calculate_bill(order.items(), 18.0)
+    assert [s['gst_percent'] for s in order.totals()['gst_breakdown']] == [18.0]
@@ -0,0 +1,64 @@
+import sqlite3
+import time
+
+from utils import db_pool, order_writer, repository
+from utils.billing_service import BillingService
+from utils.migrations import migrate
+from utils.order_writer import build_order, write_order
+from utils.tabs import TabManager
+
+BILL = {'total': 105.0, 'gst': 5.0, 'discount': 0.0}
+TEA = {'id': 1, 'name': "Tea", 'category': "Beverage", 'price': 100.0, 'gst_percent': None}
+
+
+def test_storing_the_order_deletes_the_tab_lines_it_billed(tmp_path):
+    path = str(tmp_path / "tabs.db")
+    migrate(path)
+    conn = db_pool.get_connection(path)
+    now = time.time()
+    repository.apply_tab_changes([
+        ('tab_line_set', ("T1", 1, "Tea", "Beverage", 100.0, None, 1, now - 60)),
+        ('tab_line_set', ("T2", 1, "Tea", "Beverage", 100.0, None, 1, now - 60)),
+    ], conn)
+    order = dict(build_order("Dine-In", "Cash", BILL, [dict(TEA, quantity=1)], tab="T1"), journal_id="j1")
+    # a line rung up after the close belongs to the tab reopened under the same name
+    repository.apply_tab_changes([('tab_line_set', ("T1", 2, "Coffee", "Beverage", 90.0, None, 1,
+                                                    order['tab_closed_at'] + 1))], conn)
+
+    write_order(order, conn)
+    write_order(order, conn)        # a replay of the same journal record
+
+    assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 1
+    assert [(tab, item_id) for tab, item_id, *_ in repository.open_tab_lines(conn)] == [("T1", 2), ("T2", 1)]
+
+
+def test_tab_closed_while_database_is_down_is_not_reopened(tmp_path):
+    path = str(tmp_path / "tabs.db")
+    migrate(path)
+    journal = order_writer.enable_journal(path=str(tmp_path / "orders.journal"), db_path=path,
+                                          start=False, wait=0)
+    try:
+        till = TabManager(BillingService(), db_path=path)
+        till.open("T6")
+        till.order("T6").add(TEA, 2)
+        assert till.flush(5)
+
+        down = sqlite3.connect(path, isolation_level=None)
+        down.execute("BEGIN EXCLUSIVE")     # nothing else can write until rollback
+        try:
+            assert till.close("T6")['order_id'] is None     # safe in the journal only
+            assert [row[0] for row in repository.open_tab_lines(down)] == ["T6"]
+            # the till restarts now: the journal still holds the order, the rows are still there
+            restarted = TabManager(BillingService(), db_path=path)
+            assert restarted.recover(down, journal) == []
+        finally:
+            down.rollback()
+            down.close()
+
+        assert journal.replay(db_pool.get_connection(path)) == 1
+        assert till.flush(30)
+        conn = db_pool.get_connection(path)
+        assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 1
+        assert repository.open_tab_lines(conn) == []
+    finally:
+        order_writer.disable_journal()
@@ -1,253 +1,197 @@
+import sqlite3
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import csv
-import sqlite3
-from datetime import datetime
-import os
-from utils.pdf_generator import generate_pdf_bill
-from utils.calculator import calculate_bill
-
-DB_PATH = "db/restaurant.db"
-MENU_CSV = "data/menu.csv"
+from utils.pdf_generator import open_file
+from utils.bill_renderer import BillRenderService
+from utils.billing_service import BillingService
+from utils.migrations import migrate
+from utils import analytics
+from utils.menu_cache import menu_cache
+from utils.menu_watch import MenuChangeWatcher
+from utils.metrics import instrument, registry as metrics_registry, capture_profile, profile_next_checkout
+from utils import repository
+from utils import order_writer
+from utils.auth import authenticator
+from utils import kitchen
+from utils.menu_search import MenuSearchIndex
+from utils.tabs import TabManager
+from ui.virtual_list import VirtualList
 
 menu_items = []         
-selected_items = []
+menu_index = MenuSearchIndex()   # search over menu_items for the item picker
+menu_generation = 0
+billing = BillingService()    # UI-independent billing core; every open tab is one session
+tabs = None             # TabManager: open orders keyed by table, persisted as line deltas
+DEFAULT_TAB = "Counter"
+active_tab = None
+tab_views = {}          # tab -> (its own order Listbox, the listener keeping it current)
+till_session = None     # session and order of the active tab
+current_order = None
+bill_renderer = BillRenderService()
+pending_bills = []      # render futures polled from the Tk loop
+staff_token = None      # session of the signed-in cashier
+menu_watcher = None     # sees menu edits made on other terminals
+MENU_POLL_MS = 2000
+order_journal = None    # every checkout is appended here before it reaches the database
+JOURNAL_POLL_MS = 5000
+kitchen_bus = None      # splits each checkout into station tickets (KOTs)
+kitchen_server = None   # station screens connect here (python -m utils.kitchen display <station>)
+kitchen_server_status = ""
+KITCHEN_POLL_MS = 1000
 
 # ---------------------- DB HELPERS ----------------------
+# All queries live in utils.repository; menu writes there also invalidate menu_cache.
 
-def get_connection():
-    return sqlite3.connect(DB_PATH)
-
+@instrument()
 def setup_tables():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    with get_connection() as conn:
-        cursor = conn.cursor()
-
-        # staff
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS staff (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL
-        )
-        """)
-
-        # menu - includes available_today flag
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS menu (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            category TEXT,
-            price REAL NOT NULL,
-            gst_percent REAL,
-            available_today INTEGER DEFAULT 0
-        )
-        """)
-
-        # orders
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_type TEXT,
-            payment_method TEXT,
-            total_amount REAL,
-            gst_amount REAL,
-            discount REAL,
-            created_at TEXT
-        )
-        """)
-
-        # order_items
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS order_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER,
-            item_id INTEGER,
-            quantity INTEGER,
-            FOREIGN KEY(order_id) REFERENCES orders(id),
-            FOREIGN KEY(item_id) REFERENCES menu(id)
-        )
-        """)
-
-        # default admin
-        cursor.execute("SELECT COUNT(*) FROM staff")
-        if cursor.fetchone()[0] == 0:
-            cursor.execute("INSERT INTO staff (username, password) VALUES (?, ?)", ("admin", "admin123"))
-
-        conn.commit()
-
-    # Seed menu from CSV if menu table is empty
-    seed_menu_from_csv_if_empty()
-
-def seed_menu_from_csv_if_empty():
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM menu")
-        if cursor.fetchone()[0] == 0:
-            # if CSV exists, load rows
-            if os.path.exists(MENU_CSV):
-                with open(MENU_CSV, newline='', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    rows = []
-                    for row in reader:
-                        try:
-                            name = row['name'].strip()
-                            category = row.get('category', '').strip()
-                            price = float(row.get('price', 0))
-                            gst = float(row.get('gst_percent', 0))
-                        except Exception:
-                            continue
-                        rows.append((name, category, price, gst, 0))
-                    if rows:
-                        cursor.executemany(
-                            "INSERT INTO menu (name, category, price, gst_percent, available_today) VALUES (?, ?, ?, ?, ?)",
-                            rows
-                        )
-                        conn.commit()
-
-# ---------------------- AUTH / STAFF ----------------------
-
-def validate_login(username, password):
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM staff WHERE username=? AND password=?", (username, password))
-        return cursor.fetchone() is not None
-
-def add_staff_db(username, password):
-    try:
-        with get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO staff (username, password) VALUES (?, ?)", (username, password))
-            conn.commit()
-            return True
-    except sqlite3.IntegrityError:
-        return False
-
-def change_password_db(username, new_password):
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE staff SET password=? WHERE username=?", (new_password, username))
-        conn.commit()
-        return cursor.rowcount > 0
-
-# ---------------------- SALES & MENU DB QUERIES ----------------------
-
-def get_daily_sales():
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT IFNULL(SUM(total_amount), 0) FROM orders
-            WHERE DATE(created_at) = DATE('now')
-        """)
-        res = cursor.fetchone()
-        return res[0] if res else 0.0
+    # versioned migrations; a no-op once this process has brought the DB up to date
+    migrate()
 
+@instrument()
 def load_menu_for_billing():
-    """Load only items that are available today"""
-    global menu_items
-    menu_items.clear()
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, category, price, gst_percent FROM menu WHERE available_today=1 ORDER BY category, name")
-        for row in cursor.fetchall():
-            item = {'id': row[0], 'name': row[1], 'category': row[2], 'price': row[3], 'gst_percent': row[4]}
-            menu_items.append(item)
-
-# ---------------------- MENU MANAGEMENT (CRUD) ----------------------
-
-def get_all_menu():
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, category, price, gst_percent, available_today FROM menu ORDER BY id")
-        return cursor.fetchall()
-
-def add_menu_item_db(name, category, price, gst, available):
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO menu (name, category, price, gst_percent, available_today) VALUES (?, ?, ?, ?, ?)",
-                       (name, category, price, gst, 1 if available else 0))
-        conn.commit()
-
-def update_menu_item_db(item_id, name, category, price, gst, available):
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE menu SET name=?, category=?, price=?, gst_percent=?, available_today=? WHERE id=?",
-                       (name, category, price, gst, 1 if available else 0, item_id))
-        conn.commit()
-
-def delete_menu_item_db(item_id):
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM menu WHERE id=?", (item_id,))
-        conn.commit()
-
-def set_available_today_db(item_id, available):
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE menu SET available_today=? WHERE id=?", (1 if available else 0, item_id))
-        conn.commit()
+    """Load only items that are available today (re-reads only rows changed since the last load)"""
+    global menu_items, menu_index, menu_generation
+    menu_cache.refresh()
+    if menu_generation != menu_cache.generation:
+        menu_items = menu_cache.available()
+        menu_index = MenuSearchIndex(menu_items)
+        menu_generation = menu_cache.generation
 
 # ---------------------- ORDER LOGIC ----------------------
 
 def add_item_to_order():
-    selected_index = item_combo.current()
-    quantity = quantity_var.get()
-
-    if selected_index < 0 or quantity <= 0:
+    current_order.default_gst_percent = gst_var.get()
+    item = item_picker.selection()
+    try:
+        if item is None:
+            raise ValueError("no item selected")
+        billing.add_item(till_session, item_id=item.id, quantity=quantity_var.get())
+    except ValueError:
         messagebox.showwarning("Invalid", "Select an item and valid quantity.")
         return
+    refresh_tab_picker()
 
-    item = menu_items[selected_index]
-    item_copy = {
-        'id': item['id'],
-        'name': item['name'],
-        'price': item['price'],
-        'gst_percent': item['gst_percent'],
-        'quantity': quantity
-    }
-    selected_items.append(item_copy)
-    update_order_display()
-
-def update_order_display():
-    order_listbox.delete(0, tk.END)
-    for it in selected_items:
-        order_listbox.insert(tk.END, f"{it['name']} x {it['quantity']} = ₹{it['price'] * it['quantity']:.2f}")
+def remove_selected_item():
+    sel = order_listbox.curselection()
+    if not sel:
+        messagebox.showwarning("Invalid", "Select an order line to remove.")
+        return
+    billing.remove_item(till_session, current_order.lines()[sel[0]].id)
+    refresh_tab_picker()
+
+def format_menu_row(item):
+    return f"{item.name} ({item.category}) - ₹{item.price}"
+
+def update_item_picker(*_):
+    """Show the menu items matching the search box (all of them when it is empty)."""
+    if 'item_picker' in globals():
+        item_picker.set_items(menu_index.search(item_search_var.get(), limit=None))
+
+def format_order_line(line):
+    return f"{line.name} x {line.quantity} = ₹{line.amount:.2f}"
+
+def make_order_view(listbox):
+    """An OpenOrder listener that applies each change to listbox, touching only the affected row."""
+    def on_order_change(event, index, line):
+        if event == "clear":
+            listbox.delete(0, tk.END)
+        elif event == "insert":
+            listbox.insert(index, format_order_line(line))
+        elif event == "update":
+            listbox.delete(index)
+            listbox.insert(index, format_order_line(line))
+        elif event == "delete":
+            listbox.delete(index)
+    return on_order_change
+
+def switch_tab(tab):
+    """Show a table's order, opening the tab if needed.
+
+    Every tab keeps its own Listbox, kept current by its listener, so
+    switching only swaps which one is packed; no rows are rebuilt.
+    """
+    global active_tab, till_session, current_order, order_listbox
+    tab = tab.strip()
+    if not tab:
+        return
+    tabs.open(tab)
+    if tab not in tab_views:
+        listbox = tk.Listbox(orders_frame, width=60, height=15)
+        for line in tabs.order(tab):
+            listbox.insert(tk.END, format_order_line(line))
+        listener = make_order_view(listbox)
+        tabs.order(tab).subscribe(listener)
+        tab_views[tab] = (listbox, listener)
+    if active_tab in tab_views and active_tab != tab:
+        tab_views[active_tab][0].pack_forget()
+    active_tab = tab
+    till_session = tabs.session(tab)
+    current_order = tabs.order(tab)
+    order_listbox = tab_views[tab][0]
+    order_listbox.pack(anchor="w")
+    table_var.set(tab)
+    refresh_tab_picker()
+
+def drop_tab_view(tab):
+    listbox, listener = tab_views.pop(tab)
+    if tab in tabs:
+        tabs.order(tab).unsubscribe(listener)
+    listbox.destroy()
+
+def refresh_tab_picker():
+    table_picker.config(values=tabs.tabs())
+    open_tabs_label.config(text="  ".join(f"{tab}: ₹{total:.2f}" for tab, lines, total in tabs.summary() if lines))
 
 def show_total():
-    gst = gst_var.get()
+    with capture_profile("checkout") as report_path:
+        checkout_current_order()
+    if report_path:
+        messagebox.showinfo("Checkout Profile", f"Profile written to {report_path}")
+
+def checkout_current_order():
     discount = discount_var.get()
-    bill = calculate_bill(selected_items, gst, discount)
+    if not current_order:
+        messagebox.showwarning("Empty Order", "Add at least one item first.")
+        return
+    current_order.default_gst_percent = gst_var.get()     # the rate may have changed since the last item
+    bill = billing.totals(till_session, discount)
+    slab_lines = "".join(f"  @{s['gst_percent']:g}% on ₹{s['taxable']:.2f}: ₹{s['gst']:.2f}\n" for s in bill['gst_breakdown'])
 
     messagebox.showinfo("Final Bill", f"""
 Subtotal: ₹{bill['subtotal']:.2f}
 GST: ₹{bill['gst']:.2f}
-Discount: ₹{bill['discount']:.2f}
+{slab_lines}Discount: ₹{bill['discount']:.2f}
 ---------------------------
 Total: ₹{bill['total']:.2f}
 """)
-    save_order_to_db(bill)
-    generate_pdf_bill(selected_items, bill)
-    selected_items.clear()
-    update_order_display()
+    try:
+        result = tabs.close(active_tab, order_type_var.get(), payment_method_var.get(), discount)
+    except (ValueError, OSError, RuntimeError, sqlite3.Error) as e:
+        # nothing was journalled or stored, so the tab stays open to retry
+        messagebox.showerror("Checkout Failed", str(e))
+        return
+    pending_bills.append(bill_renderer.submit(result['items'], result['bill'], order_id=result['order_id']))
+    drop_tab_view(active_tab)
+    switch_tab(DEFAULT_TAB)
     refresh_sales_label()
 
-def save_order_to_db(bill):
-    order_type = order_type_var.get()
-    payment = payment_method_var.get()
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-        INSERT INTO orders (order_type, payment_method, total_amount, gst_amount, discount, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """, (order_type, payment, bill['total'], bill['gst'], bill['discount'], now))
-        order_id = cursor.lastrowid
-
-        for it in selected_items:
-            cursor.execute("INSERT INTO order_items (order_id, item_id, quantity) VALUES (?, ?, ?)",
-                           (order_id, it['id'], it['quantity']))
-        conn.commit()
+def poll_rendered_bills(window):
+    """Open finished bill PDFs; runs on the Tk loop so no UI call leaves the main thread."""
+    for future in [f for f in pending_bills if f.done()]:
+        pending_bills.remove(future)
+        try:
+            path = future.result()
+            if bill_renderer.fmt != "escpos":     # raw printer bytes have no viewer
+                open_file(path)
+        except Exception as e:
+            messagebox.showerror("Bill PDF", f"Could not create bill PDF: {e}")
+    window.after(200, poll_rendered_bills, window)
+
+def poll_menu_changes(window):
+    """Pick up menu edits made on other terminals sharing the database."""
+    if menu_watcher.poll():
+        refresh_menu_and_ui()
+    window.after(MENU_POLL_MS, poll_menu_changes, window)
 
 # ---------------------- UI: Menu Management Window ----------------------
 
@@ -268,11 +212,9 @@ def manage_menu_window(parent):
     def load_tree():
         for r in tree.get_children():
             tree.delete(r)
-        for row in get_all_menu():
-            # row = (id, name, category, price, gst, available)
-            row_list = list(row)
-            row_list[5] = "Yes" if row_list[5] == 1 else "No"
-            tree.insert("", tk.END, values=row_list)
+        for it in repository.list_menu():
+            tree.insert("", tk.END, values=(it.id, it.name, it.category, it.price, it.gst_percent,
+                                            "Yes" if it.available_today == 1 else "No"))
 
     # Form frame
     form = tk.Frame(win)
@@ -328,7 +270,7 @@ def manage_menu_window(parent):
         if not name:
             messagebox.showerror("Error", "Name required.")
             return
-        add_menu_item_db(name, cat, price, gst, avail_var.get())
+        repository.add_menu_item(name, cat, price, gst, avail_var.get())
         load_tree()
         clear_form()
 
@@ -346,7 +288,7 @@ def manage_menu_window(parent):
         except:
             messagebox.showerror("Error", "Price and GST must be numeric.")
             return
-        update_menu_item_db(item_id, name, cat, price, gst, avail_var.get())
+        repository.update_menu_item(item_id, name, cat, price, gst, avail_var.get())
         load_tree()
         clear_form()
 
@@ -357,7 +299,7 @@ def manage_menu_window(parent):
             return
         item_id = tree.item(sel[0])['values'][0]
         if messagebox.askyesno("Confirm", "Delete selected item?"):
-            delete_menu_item_db(item_id)
+            repository.delete_menu_item(item_id)
             load_tree()
             clear_form()
 
@@ -378,27 +320,22 @@ def update_daily_menu_window(parent):
     win.title("Update Today's Menu")
     win.geometry("400x500")
 
-    rows = get_all_menu()
-    vars_map = {}
-    canvas = tk.Canvas(win)
-    scrollbar = ttk.Scrollbar(win, orient="vertical", command=canvas.yview)
-    frame = tk.Frame(canvas)
-    frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-    canvas.create_window((0,0), window=frame, anchor="nw")
-    canvas.configure(yscrollcommand=scrollbar.set)
-    canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-    for r in rows:
-        item_id, name, cat, price, gst, avail = r
-        v = tk.IntVar(value=1 if avail==1 else 0)
-        chk = tk.Checkbutton(frame, text=f"{name} ({cat}) - ₹{price}", variable=v, anchor="w")
-        chk.pack(fill=tk.X, padx=6, pady=2)
-        vars_map[item_id] = v
+    rows = repository.list_menu()
+    index = MenuSearchIndex(rows)
+    was_available = {it.id for it in rows if it.available_today == 1}
+
+    search_var = tk.StringVar()
+    tk.Entry(win, textvariable=search_var).pack(fill=tk.X, padx=6, pady=(6, 0))
+    checklist = VirtualList(win, format_row=format_menu_row, checkable=True, rows=18)
+    checklist.checked = set(was_available)
+    checklist.pack(fill=tk.BOTH, expand=True, padx=6, pady=6)
+    search_var.trace_add("write", lambda *_: checklist.set_items(index.search(search_var.get(), limit=None)))
+    checklist.set_items(rows)
 
     def save():
-        for item_id, var in vars_map.items():
-            set_available_today_db(item_id, var.get())
+        # one transaction for just the rows that were toggled
+        toggled = checklist.checked ^ was_available
+        repository.set_availability({item_id: item_id in checklist.checked for item_id in toggled})
         messagebox.showinfo("Saved", "Today's menu updated.")
         win.destroy()
         refresh_menu_and_ui()
@@ -408,10 +345,9 @@ def update_daily_menu_window(parent):
 # ---------------------- UI: Billing ----------------------
 
 def refresh_menu_and_ui():
-    # reload menu items for billing and refresh combo
+    # reload menu items for billing and refresh the item picker
     load_menu_for_billing()
-    if 'item_combo' in globals():
-        item_combo['values'] = [it['name'] for it in menu_items]
+    update_item_picker()
 
 def add_new_staff_ui():
     username = simpledialog.askstring("Add Staff", "Enter new username:")
@@ -420,7 +356,7 @@ def add_new_staff_ui():
     password = simpledialog.askstring("Add Staff", "Enter password:", show="*")
     if not password:
         return
-    if add_staff_db(username, password):
+    if authenticator.add_staff(username, password):
         messagebox.showinfo("Success", "Staff added.")
     else:
         messagebox.showerror("Error", "Username exists.")
@@ -432,24 +368,162 @@ def update_password_ui():
     new_pwd = simpledialog.askstring("Change Password", "Enter new password:", show="*")
     if not new_pwd:
         return
-    if change_password_db(username, new_pwd):
+    if authenticator.change_password(username, new_pwd):
         messagebox.showinfo("Success", "Password updated.")
     else:
         messagebox.showerror("Error", "User not found.")
 
 def show_daily_sales():
-    sales = get_daily_sales()
+    sales = repository.daily_sales()
     messagebox.showinfo("Daily Sales", f"Today's Sales: ₹{sales:.2f}")
 
+def show_sales_dashboard(parent):
+    """Top sellers, category mix and an hourly heatmap, read from the analytics summaries."""
+    win = tk.Toplevel(parent)
+    win.title("Sales Dashboard")
+    win.geometry("900x640")
+
+    top = tk.Frame(win)
+    top.pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
+
+    # Top sellers today
+    sellers_frame = tk.LabelFrame(top, text="Top Sellers Today")
+    sellers_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=4)
+    sellers = ttk.Treeview(sellers_frame, columns=("Item", "Category", "Qty", "Sales"), show="headings", height=10)
+    for c, w in (("Item", 180), ("Category", 110), ("Qty", 50), ("Sales", 80)):
+        sellers.heading(c, text=c)
+        sellers.column(c, width=w, anchor="w" if c == "Item" else "center")
+    sellers.pack(fill=tk.BOTH, expand=True)
+
+    # Category mix today
+    mix_frame = tk.LabelFrame(top, text="Category Mix Today")
+    mix_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=4)
+    mix = ttk.Treeview(mix_frame, columns=("Category", "Qty", "Sales", "Share"), show="headings", height=10)
+    for c in ("Category", "Qty", "Sales", "Share"):
+        mix.heading(c, text=c)
+        mix.column(c, width=90, anchor="center")
+    mix.pack(fill=tk.BOTH, expand=True)
+
+    # Hourly heatmap, last 7 days
+    heat_frame = tk.LabelFrame(win, text="Sales by Hour (last 7 days)")
+    heat_frame.pack(fill=tk.X, padx=8, pady=8)
+    cell_w, cell_h, label_w = 30, 24, 90
+    heat = tk.Canvas(heat_frame, width=label_w + 24 * cell_w, height=(7 + 1) * cell_h, bg="white")
+    heat.pack(padx=4, pady=4)
+
+    def load():
+        for tree in (sellers, mix):
+            for r in tree.get_children():
+                tree.delete(r)
+        for item_id, name, cat, qty, revenue in analytics.top_sellers(limit=15):
+            sellers.insert("", tk.END, values=(name, cat, qty, f"₹{revenue:.2f}"))
+        for cat, qty, revenue, share in analytics.category_mix():
+            mix.insert("", tk.END, values=(cat, qty, f"₹{revenue:.2f}", f"{share}%"))
+
+        heat.delete("all")
+        dates, grid = analytics.hourly_heatmap(7)
+        peak = max((v for row in grid for v in row), default=0) or 1
+        for h in range(24):
+            heat.create_text(label_w + h * cell_w + cell_w / 2, cell_h / 2, text=str(h))
+        for i, day in enumerate(dates):
+            y = (i + 1) * cell_h
+            heat.create_text(label_w / 2, y + cell_h / 2, text=day)
+            for h, value in enumerate(grid[i]):
+                shade = 255 - int(200 * value / peak)
+                heat.create_rectangle(label_w + h * cell_w, y, label_w + (h + 1) * cell_w, y + cell_h,
+                                      fill=f"#{shade:02x}{shade:02x}ff", outline="#dddddd")
+
+    tk.Button(win, text="Refresh", command=load).pack(pady=4)
+    load()
+
+def show_kitchen_board(parent):
+    """Open kitchen tickets with per-station backlog; Bump marks the selected ticket done."""
+    win = tk.Toplevel(parent)
+    win.title("Kitchen Tickets")
+    win.geometry("700x420")
+
+    backlog_label = tk.Label(win, anchor="w", justify=tk.LEFT)
+    backlog_label.pack(fill=tk.X, padx=8, pady=6)
+    tk.Label(win, text=kitchen_server_status, anchor="w", fg="gray").pack(fill=tk.X, padx=8)
+    tickets = ttk.Treeview(win, columns=("KOT", "Station", "Items", "Age"), show="headings", height=14)
+    for c, w in (("KOT", 60), ("Station", 90), ("Items", 420), ("Age", 70)):
+        tickets.heading(c, text=c)
+        tickets.column(c, width=w, anchor="w" if c == "Items" else "center")
+    tickets.pack(fill=tk.BOTH, expand=True, padx=8)
+
+    def load():
+        if not win.winfo_exists():
+            return
+        selected = set(tickets.selection())
+        tickets.delete(*tickets.get_children())
+        for t in kitchen_bus.open_tickets():
+            items = ", ".join(f"{qty} x {name}" for name, qty in t.lines)
+            tickets.insert("", tk.END, iid=t.id, values=(t.number, t.station, items, f"{t.age:.0f}s"))
+        tickets.selection_set([iid for iid in selected if tickets.exists(iid)])
+        backlog = kitchen_bus.backlog()
+        backlog_label.config(text="   ".join(f"{station}: {count} open, oldest {oldest:.0f}s"
+                                            for station, (count, oldest) in sorted(backlog.items()))
+                             or "No open tickets")
+        win.after(KITCHEN_POLL_MS, load)
+
+    def bump():
+        for ticket_id in tickets.selection():
+            kitchen_bus.bump(ticket_id)
+        load()
+
+    tk.Button(win, text="Bump (done)", command=bump).pack(pady=6)
+    load()
+
+def arm_checkout_profile():
+    profile_next_checkout()
+    messagebox.showinfo("Profiling", "The next checkout will be profiled (cProfile + tracemalloc).")
+
+def show_metrics():
+    path = metrics_registry.dump()
+    messagebox.showinfo("Metrics", f"Saved to {path}\n\n{metrics_registry.report()}")
+
 def refresh_sales_label():
-    if 'daily_sales_label' in globals():
-        daily_sales_label.config(text=f"Today's Sales: ₹{get_daily_sales():.2f}")
+    if 'daily_sales_label' not in globals():
+        return
+    text = f"Today's Sales: ₹{repository.daily_sales():.2f}"
+    waiting = order_journal.pending() if order_journal else 0
+    if waiting:
+        text += f"  ({waiting} orders waiting for the database)"
+    daily_sales_label.config(text=text)
+
+def poll_order_journal(window):
+    """Keep the sales label current while journalled orders reach the database."""
+    refresh_sales_label()
+    window.after(JOURNAL_POLL_MS, poll_order_journal, window)
 
 def run_billing_ui():
+    global menu_watcher, order_journal, kitchen_bus, kitchen_server, kitchen_server_status, tabs, active_tab
     setup_tables()
+    order_journal = order_writer.enable_journal()   # checkout = one local append; the database catches up behind it
+    if tabs is None:
+        tabs = TabManager(billing)
+        tabs.recover(journal=order_journal)     # tables left open when the till last stopped
+    for tab in list(tab_views):     # views of a previous window (after logout)
+        listbox, listener = tab_views.pop(tab)
+        if tab in tabs:
+            tabs.order(tab).unsubscribe(listener)
+    active_tab = None
+    if menu_watcher is None:
+        menu_watcher = MenuChangeWatcher()
+    if kitchen_bus is None:
+        kitchen_bus = kitchen.KitchenBus().attach()
+        try:
+            kitchen_server = kitchen.serve_configured(kitchen_bus)
+        except OSError as e:
+            # address taken (another till on this machine); the board still works
+            kitchen_server_status = f"Station screens: could not listen ({e})"
+        else:
+            kitchen_server_status = ("Station screens: off (set BILLING_KITCHEN_SERVE=1)" if kitchen_server is None
+                                     else f"Station screens: listening on {kitchen_server.server_address}")
     refresh_menu_and_ui()
 
-    global item_combo, quantity_var, order_listbox, gst_var, discount_var, order_type_var, payment_method_var, daily_sales_label
+    global item_search_var, item_picker, quantity_var, gst_var, discount_var, order_type_var, payment_method_var, daily_sales_label
+    global table_var, table_picker, open_tabs_label, orders_frame
 
     root = tk.Tk()
     root.title("Restaurant Billing System")
@@ -459,7 +533,7 @@ def run_billing_ui():
     top_frame = tk.Frame(root)
     top_frame.pack(fill=tk.X, pady=6)
 
-    daily_sales_label = tk.Label(top_frame, text=f"Today's Sales: ₹{get_daily_sales():.2f}", font=("Arial", 14), fg="blue")
+    daily_sales_label = tk.Label(top_frame, text=f"Today's Sales: ₹{repository.daily_sales():.2f}", font=("Arial", 14), fg="blue")
     daily_sales_label.pack(side=tk.LEFT, padx=10)
 
     tk.Button(top_frame, text="Manage Menu", command=lambda: manage_menu_window(root)).pack(side=tk.RIGHT, padx=6)
@@ -473,14 +547,32 @@ def run_billing_ui():
     right.pack(side=tk.RIGHT, fill=tk.Y, padx=10, pady=8)
 
     # Left: order entry
-    tk.Label(left, text="Order Type").pack(anchor="w")
+    tk.Label(left, text="Table (pick an open tab or type a new one)").pack(anchor="w")
+    table_var = tk.StringVar()
+    table_picker = ttk.Combobox(left, textvariable=table_var, width=20)
+    table_picker.pack(anchor="w")
+    table_picker.bind("<<ComboboxSelected>>", lambda e: switch_tab(table_var.get()))
+    table_picker.bind("<Return>", lambda e: switch_tab(table_var.get()))
+    open_tabs_label = tk.Label(left, text="", fg="gray", wraplength=500, justify=tk.LEFT)
+    open_tabs_label.pack(anchor="w")
+
+    tk.Label(left, text="Order Type").pack(anchor="w", pady=(8,0))
     order_type_var = tk.StringVar(value="Dine-In")
     tk.Radiobutton(left, text="Dine-In", variable=order_type_var, value="Dine-In").pack(anchor="w")
     tk.Radiobutton(left, text="Takeaway", variable=order_type_var, value="Takeaway").pack(anchor="w")
 
-    tk.Label(left, text="Select Item").pack(anchor="w", pady=(8,0))
-    item_combo = ttk.Combobox(left, values=[it['name'] for it in menu_items], width=40)
-    item_combo.pack(anchor="w")
+    tk.Label(left, text="Select Item (type to search)").pack(anchor="w", pady=(8,0))
+    item_search_var = tk.StringVar()
+    search_entry = tk.Entry(left, textvariable=item_search_var, width=52)
+    search_entry.pack(anchor="w")
+    item_picker = VirtualList(left, format_row=format_menu_row, on_activate=lambda it: add_item_to_order(),
+                              rows=5, width=50)
+    item_picker.pack(anchor="w")
+    item_search_var.trace_add("write", update_item_picker)
+    search_entry.bind("<Down>", lambda e: item_picker.move_selection(1))
+    search_entry.bind("<Up>", lambda e: item_picker.move_selection(-1))
+    search_entry.bind("<Return>", lambda e: add_item_to_order())
+    update_item_picker()
 
     tk.Label(left, text="Quantity").pack(anchor="w", pady=(8,0))
     quantity_var = tk.IntVar(value=1)
@@ -489,10 +581,12 @@ def run_billing_ui():
     tk.Button(left, text="Add to Order", command=add_item_to_order).pack(anchor="w", pady=6)
 
     tk.Label(left, text="Order Summary").pack(anchor="w", pady=(8,0))
-    order_listbox = tk.Listbox(left, width=60, height=15)
-    order_listbox.pack(anchor="w")
+    orders_frame = tk.Frame(left)
+    orders_frame.pack(anchor="w")
+    switch_tab(DEFAULT_TAB)
+    tk.Button(left, text="Remove Selected", command=remove_selected_item).pack(anchor="w", pady=4)
 
-    tk.Label(left, text="GST (%)").pack(anchor="w", pady=(8,0))
+    tk.Label(left, text="Default GST (%) for items without a rate").pack(anchor="w", pady=(8,0))
     gst_var = tk.DoubleVar(value=5.0)
     tk.Entry(left, textvariable=gst_var, width=10).pack(anchor="w")
 
@@ -508,15 +602,23 @@ def run_billing_ui():
 
     # Right: utility buttons
     tk.Button(right, text="View Daily Sales", command=show_daily_sales, width=20).pack(pady=6)
+    tk.Button(right, text="Sales Dashboard", command=lambda: show_sales_dashboard(root), width=20).pack(pady=6)
+    tk.Button(right, text="Kitchen Tickets", command=lambda: show_kitchen_board(root), width=20).pack(pady=6)
     tk.Button(right, text="Add Staff", command=add_new_staff_ui, width=20).pack(pady=6)
     tk.Button(right, text="Change Password", command=update_password_ui, width=20).pack(pady=6)
+    tk.Button(right, text="Show Metrics", command=show_metrics, width=20).pack(pady=6)
+    tk.Button(right, text="Profile Next Checkout", command=arm_checkout_profile, width=20).pack(pady=6)
     tk.Button(right, text="Logout", command=lambda: logout(root), bg="red", fg="white", width=20).pack(pady=20)
 
+    poll_rendered_bills(root)
+    poll_menu_changes(root)
+    poll_order_journal(root)
     root.mainloop()
 
 # ---------------------- LOGIN & LAUNCH ----------------------
 
 def logout(window):
+    authenticator.logout(staff_token)
     window.destroy()
     show_login_window()
 
@@ -537,7 +639,10 @@ def show_login_window():
     def do_login():
         username = username_var.get()
         password = password_var.get()
-        if validate_login(username, password):
+        global staff_token
+        token = authenticator.login(username, password)   # slow hash only on a user's first login
+        if token:
+            staff_token = token
             login.destroy()
             run_billing_ui()
         else:
@@ -0,0 +1,129 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualList(tk.Frame):
+    """A scrolling list that only has widgets for the rows on screen.
+
+    The list keeps a fixed pool of `rows` labels and re-labels them as it
+    scrolls, so showing 10,000 items costs the same as showing 10. With
+    checkable=True each row shows a check box. Clicking a row toggles
+    key(item) in ``checked``.
+    """
+
+    def __init__(self, parent, format_row=str, on_activate=None, checkable=False, key=None,
+                 rows=12, width=50, **kw):
+        super().__init__(parent, **kw)
+        self.format_row = format_row
+        self.on_activate = on_activate
+        self.checkable = checkable
+        self.key = key or (lambda item: item['id'])
+        self.checked = set()
+        self.items = []
+        self.first = 0
+        self.selected = None
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        body = tk.Frame(self, bg="white", bd=1, relief=tk.SUNKEN)
+        body.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self._labels = []
+        for r in range(rows):
+            label = tk.Label(body, anchor="w", width=width, bg="white")
+            label.pack(fill=tk.X)
+            label.bind("<Button-1>", lambda e, r=r: self._click(r))
+            label.bind("<Double-Button-1>", lambda e, r=r: self._activate(r))
+            for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+                label.bind(seq, self._wheel)
+            self._labels.append(label)
+        body.bind("<MouseWheel>", self._wheel)
+
+    # ---------------------- data ----------------------
+
+    def set_items(self, items):
+        self.items = list(items)
+        self.first = 0
+        self.selected = 0 if self.items else None
+        self.render()
+
+    def selection(self):
+        """The selected item, or None."""
+        return self.items[self.selected] if self.selected is not None else None
+
+    def move_selection(self, delta):
+        if not self.items:
+            return
+        current = -1 if self.selected is None else self.selected
+        self.selected = max(0, min(len(self.items) - 1, current + delta))
+        self.see(self.selected)
+
+    def toggle(self, item):
+        k = self.key(item)
+        if k in self.checked:
+            self.checked.discard(k)
+        else:
+            self.checked.add(k)
+        self.render()
+
+    # ---------------------- scrolling ----------------------
+
+    def see(self, index):
+        rows = len(self._labels)
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + rows:
+            self.first = index - rows + 1
+        self.render()
+
+    def yview(self, *args):
+        """Scrollbar protocol: ("moveto", fraction) or ("scroll", n, "units"|"pages")."""
+        rows = len(self._labels)
+        if args[0] == "moveto":
+            first = int(float(args[1]) * len(self.items))
+        else:
+            step = rows if args[2] == "pages" else 1
+            first = self.first + int(args[1]) * step
+        self.first = max(0, min(first, max(0, len(self.items) - rows)))
+        self.render()
+
+    def _wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.yview("scroll", -3, "units")
+        else:
+            self.yview("scroll", 3, "units")
+        return "break"
+
+    def render(self):
+        n = len(self.items)
+        for r, label in enumerate(self._labels):
+            i = self.first + r
+            if i >= n:
+                label.config(text="", bg="white")
+                continue
+            item = self.items[i]
+            text = self.format_row(item)
+            if self.checkable:
+                text = ("☑ " if self.key(item) in self.checked else "☐ ") + text
+            label.config(text=text, bg="#cce0ff" if i == self.selected else "white")
+        if n:
+            self.scrollbar.set(self.first / n, min(1.0, (self.first + len(self._labels)) / n))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    # ---------------------- events ----------------------
+
+    def _click(self, row):
+        i = self.first + row
+        if i >= len(self.items):
+            return
+        self.selected = i
+        if self.checkable:
+            self.toggle(self.items[i])
+        else:
+            self.render()
+
+    def _activate(self, row):
+        i = self.first + row
+        if i < len(self.items) and self.on_activate and not self.checkable:
+            self.selected = i
+            self.on_activate(self.items[i])
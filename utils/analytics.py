@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+
+from utils import db_pool
+from utils.metrics import instrument
+
+HWM_KEY = "item_sales_hourly"
+
+# order_items keeps a copy of the item's name, category and price at sale
+# time, so history still reads correctly after the menu row is edited or deleted.
+ORDER_ITEM_SNAPSHOT_COLUMNS = (
+    ("item_name", "TEXT"),
+    ("category", "TEXT"),
+    ("unit_price", "REAL"),
+)
+
+ANALYTICS_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS item_sales_hourly (
+        sale_date TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        item_name TEXT,
+        category TEXT,
+        quantity INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (sale_date, hour, item_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analytics_state (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    """,
+)
+
+REFRESH_SQL = """
+    INSERT INTO item_sales_hourly (sale_date, hour, item_id, item_name, category, quantity, revenue)
+    SELECT substr(o.created_at, 1, 10),
+           CAST(substr(o.created_at, 12, 2) AS INTEGER),
+           oi.item_id,
+           COALESCE(oi.item_name, m.name, 'Deleted item #' || oi.item_id),
+           COALESCE(oi.category, m.category, ''),
+           SUM(oi.quantity),
+           SUM(oi.quantity * COALESCE(oi.unit_price, m.price, 0))
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    LEFT JOIN menu m ON m.id = oi.item_id
+    WHERE o.id > ? AND o.id <= ? AND o.created_at IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (sale_date, hour, item_id) DO UPDATE SET
+        quantity = quantity + excluded.quantity,
+        revenue = revenue + excluded.revenue,
+        item_name = excluded.item_name,
+        category = excluded.category
+"""
+
+
+def setup_analytics(cursor):
+    """Add order_items snapshot columns and the summary tables."""
+    cursor.execute("PRAGMA table_info(order_items)")
+    columns = [col[1] for col in cursor.fetchall()]
+    missing = [(name, kind) for name, kind in ORDER_ITEM_SNAPSHOT_COLUMNS if name not in columns]
+    for name, kind in missing:
+        cursor.execute(f"ALTER TABLE order_items ADD COLUMN {name} {kind}")
+    if missing:
+        # capture what existing rows were sold as while the menu rows still exist
+        cursor.execute("""
+            UPDATE order_items SET
+                item_name = (SELECT name FROM menu WHERE menu.id = order_items.item_id),
+                category = (SELECT category FROM menu WHERE menu.id = order_items.item_id),
+                unit_price = (SELECT price FROM menu WHERE menu.id = order_items.item_id)
+            WHERE item_name IS NULL
+        """)
+    for stmt in ANALYTICS_DDL:
+        cursor.execute(stmt)
+
+
+@instrument()
+def refresh(conn=None, chunk=50000):
+    """Fold orders newer than the high-water mark into item_sales_hourly.
+
+    Works through new orders in id ranges of `chunk`, each in its own
+    write transaction that reads and advances the mark, so tills
+    refreshing at the same time never fold the same orders twice. Returns
+    the number of orders processed.
+    """
+    conn = conn or db_pool.get_connection()
+    hwm, top = _mark(conn)
+    if hwm >= top:
+        return 0        # nothing new: no write lock for the common dashboard read
+    done = 0
+    while True:
+        folded = db_pool.retry_busy(_fold_chunk, conn, chunk)
+        if not folded:
+            return done
+        done += folded
+
+
+def _mark(conn):
+    """(high-water mark, newest order id)."""
+    row = conn.execute("SELECT value FROM analytics_state WHERE name = ?", (HWM_KEY,)).fetchone()
+    return row[0] if row else 0, conn.execute("SELECT IFNULL(MAX(id), 0) FROM orders").fetchone()[0]
+
+
+def _fold_chunk(conn, chunk):
+    with db_pool.immediate(conn):
+        hwm, top = _mark(conn)      # re-read under the write lock: another till may have folded them
+        if hwm >= top:
+            return 0
+        upto = min(hwm + chunk, top)
+        conn.execute(REFRESH_SQL, (hwm, upto))
+        conn.execute(
+            "INSERT INTO analytics_state (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (HWM_KEY, upto)
+        )
+        return upto - hwm
+
+
+def _day(value=None):
+    if value is None:
+        value = datetime.now()
+    return value if isinstance(value, str) else value.strftime("%Y-%m-%d")
+
+
+# ---------------------- QUERIES (summary tables only) ----------------------
+
+def top_sellers(day=None, limit=10, conn=None):
+    """[(item_id, name, category, quantity, revenue)] for one day, best first."""
+    conn = conn or db_pool.get_connection()
+    refresh(conn)
+    return conn.execute("""
+        SELECT item_id, MAX(item_name), MAX(category), SUM(quantity), ROUND(SUM(revenue), 2)
+        FROM item_sales_hourly
+        WHERE sale_date = ?
+        GROUP BY item_id
+        ORDER BY SUM(quantity) DESC, SUM(revenue) DESC
+        LIMIT ?
+    """, (_day(day), limit)).fetchall()
+
+
+def category_mix(start=None, end=None, conn=None):
+    """[(category, quantity, revenue, share_percent)] for a day range (default: today)."""
+    conn = conn or db_pool.get_connection()
+    refresh(conn)
+    start = _day(start)
+    end = _day(end) if end else start
+    rows = conn.execute("""
+        SELECT category, SUM(quantity), SUM(revenue)
+        FROM item_sales_hourly
+        WHERE sale_date BETWEEN ? AND ?
+        GROUP BY category
+        ORDER BY SUM(revenue) DESC
+    """, (start, end)).fetchall()
+    total = sum(r[2] for r in rows) or 1
+    return [(cat or "Uncategorised", qty, round(rev, 2), round(rev * 100 / total, 1)) for cat, qty, rev in rows]
+
+
+def hourly_heatmap(days=7, end=None, conn=None):
+    """Revenue per (day, hour) for the last `days` days.
+
+    Returns (dates, grid) where grid[i][h] is the revenue on dates[i] at hour h.
+    """
+    conn = conn or db_pool.get_connection()
+    refresh(conn)
+    last = datetime.strptime(_day(end), "%Y-%m-%d")
+    dates = [(last - timedelta(days=n)).strftime("%Y-%m-%d") for n in range(days - 1, -1, -1)]
+    grid = [[0.0] * 24 for _ in dates]
+    index = {d: i for i, d in enumerate(dates)}
+    for sale_date, hour, revenue in conn.execute("""
+        SELECT sale_date, hour, SUM(revenue)
+        FROM item_sales_hourly
+        WHERE sale_date BETWEEN ? AND ?
+        GROUP BY sale_date, hour
+    """, (dates[0], dates[-1])):
+        grid[index[sale_date]][hour] = round(revenue, 2)
+    return dates, grid
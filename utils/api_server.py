@@ -0,0 +1,226 @@
+"""Local HTTP/JSON API over BillingService, for tablets and kiosks.
+
+Run with ``python -m utils.api_server --port 8080``. With --require-auth,
+every endpoint except /login needs an ``Authorization: Bearer <token>``
+header. Endpoints:
+
+    POST   /login                               {"username", "password"} -> {"token"}
+    POST   /logout                              ends the caller's token
+    GET    /menu                                items available today
+    GET    /sales/today                         today's sales total
+    POST   /sessions                            open an order -> {"session_id"}
+    GET    /sessions/<sid>                      lines and running totals
+    DELETE /sessions/<sid>                      discard an open order
+    POST   /sessions/<sid>/items                {"item_id"|"name", "quantity"}
+    PUT    /sessions/<sid>/items/<item_id>      {"quantity"}
+    DELETE /sessions/<sid>/items/<item_id>
+    POST   /sessions/<sid>/checkout             {"order_type", "payment_method", "discount_percent"}
+    POST   /orders                              one-shot: {"items": [...], ...checkout fields}
+
+A session untouched for BILLING_API_SESSION_IDLE seconds (default an hour)
+is discarded, so clients that never check out do not hold memory forever.
+A database error is answered with 503.
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import repository
+from utils.auth import authenticator
+from utils.billing_service import BillingService
+from utils.menu_watch import MenuChangeWatcher
+from utils.order_writer import enable_write_queue
+
+SESSION_IDLE = int(os.environ.get("BILLING_API_SESSION_IDLE", "3600"))   # seconds; 0 keeps sessions forever
+
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    """HTTP server that handles requests on a fixed set of worker threads.
+
+    A fixed pool keeps each worker's pooled DB connection alive between
+    requests instead of spawning (and connecting from) a thread per request.
+    """
+
+    request_queue_size = 256
+
+    def __init__(self, address, handler, workers=32):
+        super().__init__(address, handler)
+        self._requests = queue.Queue()
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"api-{i}", daemon=True).start()
+
+    def process_request(self, request, client_address):
+        self._requests.put((request, client_address))
+
+    def _worker(self):
+        while True:
+            request, client_address = self._requests.get()
+            self.process_request_thread(request, client_address)
+
+
+def _checkout_args(body):
+    return {
+        'order_type': body.get('order_type', 'Dine-In'),
+        'payment_method': body.get('payment_method', 'Cash'),
+        'discount_percent': float(body.get('discount_percent', 0.0)),
+    }
+
+
+class BillingRequestHandler(BaseHTTPRequestHandler):
+    service = None  # set by make_server()
+    auth = None
+    require_auth = False
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _token(self):
+        header = self.headers.get("Authorization") or ""
+        return header[7:].strip() if header.startswith("Bearer ") else None
+
+    def _dispatch(self, method):
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        if self.require_auth and parts != ["login"] and self.auth.check(self._token()) is None:
+            self._send(401, {'error': "login required"})
+            return
+        try:
+            status, payload = self.route(method, parts)
+        except KeyError as e:
+            status, payload = 404, {'error': str(e).strip("'")}
+        except (ValueError, TypeError) as e:
+            status, payload = 400, {'error': str(e)}
+        except sqlite3.Error as e:
+            status, payload = 503, {'error': f"database unavailable: {e}"}
+        self._send(status, payload)
+
+    def route(self, method, parts):
+        svc = self.service
+        if parts == ["login"] and method == "POST":
+            body = self._body()
+            token = self.auth.login(str(body.get('username', '')), str(body.get('password', '')))
+            if token is None:
+                return 401, {'error': "invalid credentials"}
+            return 200, {'token': token}
+        if parts == ["logout"] and method == "POST":
+            self.auth.logout(self._token())
+            return 200, {'logged_out': True}
+        if parts == ["menu"] and method == "GET":
+            svc.menu.refresh()
+            return 200, [{'id': it.id, 'name': it.name, 'category': it.category,
+                          'price': it.price, 'gst_percent': it.gst_percent}
+                         for it in svc.menu.available()]
+        if parts == ["sales", "today"] and method == "GET":
+            return 200, {'total_sales': repository.daily_sales()}
+        if parts == ["sessions"] and method == "POST":
+            return 201, {'session_id': svc.open_session()}
+        if parts == ["orders"] and method == "POST":
+            return 201, self.create_order(self._body())
+        if len(parts) >= 2 and parts[0] == "sessions":
+            sid = parts[1]
+            rest = parts[2:]
+            if not rest and method == "GET":
+                return 200, svc.snapshot(sid)
+            if not rest and method == "DELETE":
+                if not svc.close_session(sid):
+                    raise KeyError(f"unknown session {sid}")
+                return 200, {'closed': sid}
+            if rest == ["items"] and method == "POST":
+                body = self._body()
+                svc.add_item(sid, body.get('item_id'), body.get('name'), int(body.get('quantity', 1)))
+                return 200, svc.snapshot(sid)
+            if len(rest) == 2 and rest[0] == "items" and method == "PUT":
+                svc.set_quantity(sid, int(rest[1]), int(self._body().get('quantity')))
+                return 200, svc.snapshot(sid)
+            if len(rest) == 2 and rest[0] == "items" and method == "DELETE":
+                svc.remove_item(sid, int(rest[1]))
+                return 200, svc.snapshot(sid)
+            if rest == ["checkout"] and method == "POST":
+                return 200, svc.checkout(sid, **_checkout_args(self._body()))
+        raise KeyError(f"no route for {method} {self.path}")
+
+    def create_order(self, body):
+        svc = self.service
+        sid = svc.open_session()
+        try:
+            for it in body.get('items', []):
+                svc.add_item(sid, it.get('item_id', it.get('id')), it.get('name'), int(it.get('quantity', 1)))
+            return svc.checkout(sid, **_checkout_args(body))
+        finally:
+            svc.close_session(sid)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+def _expire_sessions(service, max_idle):
+    while True:
+        time.sleep(max(1, max_idle / 10))
+        service.expire_idle(max_idle)
+
+
+def make_server(host="127.0.0.1", port=8080, service=None, workers=32, require_auth=False, auth=None,
+                session_idle=None):
+    service = service or BillingService()
+    handler = type("Handler", (BillingRequestHandler,), {'service': service,
+                                                         'auth': auth or authenticator,
+                                                         'require_auth': require_auth})
+    session_idle = SESSION_IDLE if session_idle is None else session_idle
+    if session_idle > 0:
+        threading.Thread(target=_expire_sessions, args=(service, session_idle),
+                         name="api-session-expiry", daemon=True).start()
+    return PooledHTTPServer((host, port), handler, workers=workers)
+
+
+def main():
+    from utils.db_utils import setup_tables
+
+    parser = argparse.ArgumentParser(description="Restaurant billing HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--require-auth", action="store_true", help="require a token from POST /login")
+    args = parser.parse_args()
+
+    setup_tables()
+    enable_write_queue()  # concurrent checkouts share group commits
+    MenuChangeWatcher().start()  # menu edits from the tills reach this process's cache
+    server = make_server(args.host, args.port, workers=args.workers, require_auth=args.require_auth)
+    print(f"Billing API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
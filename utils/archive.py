@@ -0,0 +1,278 @@
+"""Move closed trading days out of the hot database into yearly archive files.
+
+    python -m utils.archive run                 # archive everything older than HOT_DAYS
+    python -m utils.archive run --keep-days 0 --vacuum
+    python -m utils.archive list
+
+The hot database keeps today's trading plus the last HOT_DAYS days. Older
+orders and their lines move to ``<ARCHIVE_DIR>/orders-<year>.db``, one
+month per transaction. The daily_sales rollup and the analytics summaries
+stay in the hot database. Till checkouts and get_daily_sales therefore
+touch the same small tables however many years of history exist.
+
+The ``archives`` table in the hot database records, for each year, how far
+its file is complete (``archived_until``). An archive row counts only
+below that point. A month is copied first and deleted from the hot
+database in a second transaction that also moves ``archived_until``, so an
+interrupted run never loses or double-counts an order; running it again
+finishes the job.
+
+Historical reads go through history(): it attaches the archives a date
+range needs and exposes them, together with the hot tables, as the temp
+views ``history_orders`` and ``history_lines``.
+"""
+import argparse
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from utils import db_pool
+
+ARCHIVE_DIR = os.environ.get("BILLING_ARCHIVE_DIR", os.path.join("db", "archive"))
+HOT_DAYS = int(os.environ.get("BILLING_HOT_DAYS", "7"))     # closed days kept in the hot database
+
+ARCHIVE_CATALOG_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS archives (
+        period TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        archived_until TEXT NOT NULL,
+        first_id INTEGER,
+        last_id INTEGER,
+        orders INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+)
+
+# The hot database's indexes on these tables (repository.INDEXES and the migrations).
+HOT_INDEXES_SQL = """
+    SELECT name, sql FROM main.sqlite_master
+    WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ('orders', 'order_items')
+"""
+
+
+def setup_archive_catalog(cursor):
+    for stmt in ARCHIVE_CATALOG_DDL:
+        cursor.execute(stmt)
+
+
+def archive_path(period, archive_dir=None):
+    return os.path.join(archive_dir or ARCHIVE_DIR, f"orders-{period}.db")
+
+
+def _columns(conn, schema, table):
+    return [(row[1], row[2]) for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _mirror_tables(conn, schema):
+    """Create (or widen) the archive's orders/order_items, and their indexes, to match the hot schema."""
+    for table in ("orders", "order_items"):
+        hot = _columns(conn, "main", table)
+        have = {name for name, _ in _columns(conn, schema, table)}
+        if not have:
+            cols = ", ".join("id INTEGER PRIMARY KEY" if name == "id" else f"{name} {kind}" for name, kind in hot)
+            conn.execute(f"CREATE TABLE {schema}.{table} ({cols})")
+        for name, kind in hot:
+            if have and name not in have:
+                conn.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {name} {kind}")
+    have = {row[0] for row in conn.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'index'")}
+    for name, sql in conn.execute(HOT_INDEXES_SQL).fetchall():
+        if name not in have:
+            conn.execute(sql.replace(f" {name} ", f" {schema}.{name} ", 1))
+
+
+def _attach(conn, path, schema):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn.execute("ATTACH DATABASE ? AS " + schema, (path,))
+
+
+def _month_starts(first_day, end_day):
+    """First days of the months from first_day's month up to (not including) end_day."""
+    day = date.fromisoformat(first_day).replace(day=1)
+    end = date.fromisoformat(end_day)
+    while day < end:
+        yield day
+        day = (day + timedelta(days=32)).replace(day=1)
+
+
+def _copy_month(conn, lo, hi):
+    """Transaction 1: copy orders with lo <= created_at < hi into the attached archive."""
+    cols = ", ".join(name for name, _ in _columns(conn, "main", "orders"))
+    item_cols = ", ".join(name for name, _ in _columns(conn, "main", "order_items"))
+    with conn:      # a deferred transaction: tills keep writing to the hot database meanwhile
+        conn.execute(f"INSERT OR IGNORE INTO arc.orders ({cols}) SELECT {cols} FROM main.orders "
+                     "WHERE created_at >= ? AND created_at < ?", (lo, hi))
+        conn.execute(f"INSERT OR IGNORE INTO arc.order_items ({item_cols}) SELECT {item_cols} FROM main.order_items "
+                     "WHERE order_id IN (SELECT id FROM main.orders WHERE created_at >= ? AND created_at < ?)",
+                     (lo, hi))
+
+
+def _drop_month(conn, period, path, lo, hi):
+    """Transaction 2: delete what was copied from the hot database and move archived_until to hi."""
+    copied = ("SELECT o.id FROM main.orders o JOIN arc.orders a ON a.id = o.id "
+              "WHERE o.created_at >= ? AND o.created_at < ?")
+    with db_pool.immediate(conn):
+        left = conn.execute("SELECT COUNT(*) FROM main.orders WHERE created_at >= ? AND created_at < ? "
+                            f"AND id NOT IN ({copied})", (lo, hi, lo, hi)).fetchone()[0]
+        if left:
+            # orders that arrived after the copy (e.g. late uploads); the next run moves them
+            hi = conn.execute("SELECT MIN(created_at) FROM main.orders WHERE created_at >= ? AND created_at < ? "
+                              f"AND id NOT IN ({copied})", (lo, hi, lo, hi)).fetchone()[0]
+        n, first_id, last_id = conn.execute(f"SELECT COUNT(*), MIN(id), MAX(id) FROM ({copied})",
+                                            (lo, hi)).fetchone()
+        conn.execute(f"DELETE FROM main.order_items WHERE order_id IN ({copied})", (lo, hi))
+        conn.execute(f"DELETE FROM main.orders WHERE id IN ({copied})", (lo, hi))
+        conn.execute("""
+            INSERT INTO archives (period, path, archived_until, first_id, last_id, orders)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(period) DO UPDATE SET
+                path = excluded.path,
+                archived_until = MAX(archived_until, excluded.archived_until),
+                first_id = MIN(IFNULL(first_id, excluded.first_id), IFNULL(excluded.first_id, first_id)),
+                last_id = MAX(IFNULL(last_id, excluded.last_id), IFNULL(excluded.last_id, last_id)),
+                orders = orders + excluded.orders
+        """, (period, path, hi, first_id, last_id, n))
+    return n
+
+
+def archive_before(cutoff, conn=None, archive_dir=None):
+    """Move every order created before `cutoff` (a day) into the archives.
+
+    Returns {period: orders moved}.
+    """
+    from utils import analytics
+
+    conn = conn or db_pool.get_connection()
+    analytics.refresh(conn)     # fold orders into the hourly summaries before they leave
+    cutoff = str(cutoff)
+    years = conn.execute("SELECT substr(created_at, 1, 4), MIN(substr(created_at, 1, 10)) FROM orders "
+                         "WHERE created_at < ? GROUP BY 1 ORDER BY 1", (cutoff,)).fetchall()
+    moved = {}
+    for period, first_day in years:
+        path = archive_path(period, archive_dir)
+        _attach(conn, path, "arc")
+        try:
+            _mirror_tables(conn, "arc")
+            conn.commit()
+            end = min(cutoff, f"{int(period) + 1}-01-01")
+            for month in _month_starts(first_day, end):
+                lo = str(month)
+                hi = min(end, str((month + timedelta(days=32)).replace(day=1)))
+                db_pool.retry_busy(_copy_month, conn, lo, hi)
+                moved[period] = moved.get(period, 0) + db_pool.retry_busy(_drop_month, conn, period, path, lo, hi)
+        finally:
+            conn.execute("DETACH DATABASE arc")
+    return moved
+
+
+def archive_closed_days(keep_days=None, conn=None, archive_dir=None):
+    """Archive everything but today and the last `keep_days` (default HOT_DAYS) days."""
+    keep_days = HOT_DAYS if keep_days is None else keep_days
+    return archive_before(date.today() - timedelta(days=keep_days), conn, archive_dir)
+
+
+def list_archives(conn=None):
+    """[(period, path, archived_until, orders)] oldest first."""
+    conn = conn or db_pool.get_connection()
+    return conn.execute("SELECT period, path, archived_until, orders FROM archives ORDER BY period").fetchall()
+
+
+def _archives_for(conn, start=None, end=None, order_id=None):
+    """Catalog rows (period, path, archived_until) that may hold rows in [start, end) or the order id."""
+    if order_id is not None:
+        sql, params = "SELECT period, path, archived_until FROM archives WHERE ? BETWEEN first_id AND last_id", (order_id,)
+    else:
+        sql, params = "SELECT period, path, archived_until FROM archives WHERE 1", ()
+        if start:
+            sql, params = sql + " AND archived_until > ?", params + (str(start),)
+        if end:
+            sql, params = sql + " AND period <= substr(?, 1, 4)", params + (str(end),)
+    return [row for row in conn.execute(sql + " ORDER BY period", params) if os.path.exists(row[1])]
+
+
+def _select_orders(conn, schema, cols, until=None):
+    have = {name for name, _ in _columns(conn, schema, "orders")}
+    exprs = ", ".join(name if name in have else f"NULL AS {name}" for name in cols)
+    where = f" WHERE created_at < '{until}'" if until else ""
+    return f"SELECT {exprs} FROM {schema}.orders{where}"
+
+
+def _select_lines(schema, until=None):
+    # unary + keeps this bound from steering the plan onto the created_at index;
+    # a range from the caller's WHERE still gets pushed down and uses it
+    where = f" WHERE +o.created_at < '{until}'" if until else ""
+    return ("SELECT oi.id AS line_id, oi.order_id, o.created_at, oi.item_id, oi.item_name, oi.category, "
+            f"oi.unit_price, oi.quantity FROM {schema}.orders o JOIN {schema}.order_items oi "
+            f"ON oi.order_id = o.id{where}")
+
+
+@contextmanager
+def history(conn=None, start=None, end=None, order_id=None):
+    """Expose hot plus archived orders as the temp views history_orders and history_lines.
+
+    Only the archives that can hold rows in [start, end) (or the given
+    order id) are attached, so a report over recent days touches nothing
+    but the hot database. Filter on created_at so SQLite can push the range
+    into each attached file's index. Not re-entrant on one connection.
+    """
+    conn = conn or db_pool.get_connection()
+    archives = _archives_for(conn, start, end, order_id)
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(conn, "getlimit") else 10
+    if len(archives) > limit:
+        raise ValueError(f"range spans {len(archives)} archive files; SQLite attaches at most {limit}")
+    attached = []
+    try:
+        for period, path, _ in archives:
+            schema = f"arc_{period}"
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+            attached.append(schema)
+        cols = [name for name, _ in _columns(conn, "main", "orders")]
+        orders = [_select_orders(conn, "main", cols)]
+        lines = [_select_lines("main")]
+        for (_, _, until), schema in zip(archives, attached):
+            orders.append(_select_orders(conn, schema, cols, until))
+            lines.append(_select_lines(schema, until))
+        conn.execute("CREATE TEMP VIEW history_orders AS " + " UNION ALL ".join(orders))
+        conn.execute("CREATE TEMP VIEW history_lines AS " + " UNION ALL ".join(lines))
+        yield conn
+    finally:
+        conn.execute("DROP VIEW IF EXISTS temp.history_orders")
+        conn.execute("DROP VIEW IF EXISTS temp.history_lines")
+        if conn.in_transaction:
+            conn.commit()
+        for schema in attached:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+
+def main(argv=None):
+    from utils.migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Archive closed trading days")
+    sub = parser.add_subparsers(dest="action", required=True)
+    run = sub.add_parser("run", help="move closed days into the yearly archives")
+    run.add_argument("--keep-days", type=int, default=HOT_DAYS, help="closed days to keep hot")
+    run.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    run.add_argument("--vacuum", action="store_true", help="shrink the hot database file afterwards")
+    sub.add_parser("list", help="show the archive catalog")
+    args = parser.parse_args(argv)
+
+    migrate()
+    conn = db_pool.get_connection()
+    if args.action == "list":
+        for period, path, until, orders in list_archives(conn):
+            print(f"{period}  {orders:>9} orders  complete before {until}  {path}")
+        return
+    moved = archive_closed_days(args.keep_days, conn, args.archive_dir)
+    for period, n in moved.items():
+        print(f"{period}: {n} orders archived")
+    if not moved:
+        print("nothing to archive")
+    if args.vacuum:
+        conn.execute("VACUUM")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Staff credentials: salted PBKDF2 hashes plus in-memory session tokens.
+
+Passwords are stored as ``pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>``.
+Rows that still hold a plaintext password (from databases created before
+hashing existed) are hashed by a migration step. They are also accepted
+and re-hashed on the next successful login. The same happens to hashes
+made with fewer iterations than PBKDF2_ITERATIONS.
+
+The slow hash is only paid on the first login of a username and password
+pair. After that, a login re-reads the stored hash (one indexed lookup)
+and checks the password against a keyed HMAC held in memory. A password
+changed or revoked from another till changes the stored hash, so the
+cached entry no longer applies. API calls present a token that is a
+single dict lookup.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+
+from utils import repository
+
+ALGORITHM = "pbkdf2_sha256"
+PBKDF2_ITERATIONS = int(os.environ.get("BILLING_PBKDF2_ITERATIONS", "600000"))
+SESSION_TTL = int(os.environ.get("BILLING_SESSION_TTL", str(12 * 3600)))
+MAX_TOKENS = 10000          # purge expired tokens once this many are held
+
+
+def hash_password(password, salt=None, iterations=None):
+    iterations = iterations or PBKDF2_ITERATIONS
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def is_hashed(stored):
+    return (stored or "").startswith(ALGORITHM + "$")
+
+
+def verify_password(password, stored):
+    """(matches, needs_rehash) for a stored hash or a legacy plaintext password."""
+    if stored is None:
+        return False, False
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")), True
+    try:
+        _, iterations, salt, expected = stored.split("$")
+        iterations = int(iterations)
+        salt = bytes.fromhex(salt)
+    except ValueError:
+        return False, False
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return hmac.compare_digest(digest.hex(), expected), iterations < PBKDF2_ITERATIONS
+
+
+def hash_stored_passwords(cursor):
+    """Migration step: replace any plaintext staff passwords with hashes."""
+    cursor.execute("SELECT id, password FROM staff")
+    rows = [(hash_password(pw), staff_id) for staff_id, pw in cursor.fetchall() if not is_hashed(pw)]
+    cursor.executemany("UPDATE staff SET password = ? WHERE id = ?", rows)
+
+
+class Authenticator:
+    """Logins, password changes and session tokens for the till and the API."""
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._key = secrets.token_bytes(32)     # never leaves this process
+        self._tokens = {}                       # token -> (username, expires_at)
+        self._verified = {}                     # username -> (stored hash, HMAC of password, expires_at)
+        self._lock = threading.Lock()
+
+    def _fingerprint(self, username, password):
+        return hmac.new(self._key, f"{username}\0{password}".encode("utf-8"), hashlib.sha256).digest()
+
+    def verify(self, username, password, conn=None):
+        """True if the password is right; the slow hash runs only on a cache miss."""
+        now = time.monotonic()
+        fingerprint = self._fingerprint(username, password)
+        stored = repository.staff_password(username, conn)
+        cached = self._verified.get(username)
+        if cached and cached[0] == stored and cached[2] > now:
+            if hmac.compare_digest(cached[1], fingerprint):
+                return True
+        elif cached:
+            # changed or removed (possibly on another till), or expired
+            with self._lock:
+                self._verified.pop(username, None)
+        ok, needs_rehash = verify_password(password, stored)
+        if not ok:
+            return False
+        if needs_rehash:
+            stored = hash_password(password)
+            repository.change_password(username, stored, conn)
+        with self._lock:
+            self._verified[username] = (stored, fingerprint, now + self.ttl)
+        return True
+
+    def login(self, username, password, conn=None):
+        """A new session token, or None for bad credentials."""
+        if not self.verify(username, password, conn):
+            return None
+        if len(self._tokens) >= MAX_TOKENS:
+            self.purge()
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._tokens[token] = (username, time.monotonic() + self.ttl)
+        return token
+
+    def check(self, token):
+        """The username a live token belongs to, or None."""
+        entry = self._tokens.get(token) if token else None
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            self.logout(token)
+            return None
+        return entry[0]
+
+    def logout(self, token):
+        with self._lock:
+            self._tokens.pop(token, None)
+
+    def forget(self, username):
+        """Drop cached credentials and every token of a user."""
+        with self._lock:
+            self._verified.pop(username, None)
+            for token in [t for t, (user, _) in self._tokens.items() if user == username]:
+                del self._tokens[token]
+
+    def purge(self):
+        """Remove expired tokens and cached credentials; returns how many went."""
+        now = time.monotonic()
+        with self._lock:
+            dead = [t for t, (_, expires) in self._tokens.items() if expires <= now]
+            for token in dead:
+                del self._tokens[token]
+            stale = [u for u, (_, _, expires) in self._verified.items() if expires <= now]
+            for username in stale:
+                del self._verified[username]
+        return len(dead) + len(stale)
+
+    def add_staff(self, username, password, conn=None):
+        """Returns False if the username is taken."""
+        return repository.add_staff(username, hash_password(password), conn)
+
+    def change_password(self, username, new_password, conn=None):
+        """Returns False for an unknown user; existing sessions of the user end."""
+        changed = repository.change_password(username, hash_password(new_password), conn)
+        if changed:
+            self.forget(username)
+        return changed
+
+
+authenticator = Authenticator()
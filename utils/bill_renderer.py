@@ -0,0 +1,136 @@
+"""Background bill rendering, plus batch reprints.
+
+    python -m utils.bill_renderer --from 2025-08-01 --to 2025-08-31 --out audit_aug.pdf
+    python -m utils.bill_renderer --order 42 --order 43 --format text --out reprint.txt
+"""
+import argparse
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from utils import repository
+from utils.pdf_generator import generate_pdf_batch, generate_pdf_bill
+from utils.receipt import escpos_receipt, format_receipt, write_receipt
+
+BILL_OUTPUT_DIR = os.environ.get("BILL_OUTPUT_DIR", "bills")
+BILL_FORMAT = os.environ.get("BILL_FORMAT", "pdf")
+EXTENSIONS = {'pdf': ".pdf", 'text': ".txt", 'escpos': ".bin"}
+
+
+class BillRenderService:
+    """Renders bills on background worker threads.
+
+    ``submit`` returns immediately with a Future that resolves to the path of
+    the written file, so the Tk event loop (or a headless caller) never waits
+    on ReportLab. Every bill gets its own file in ``output_dir``. Set
+    fmt="text" or "escpos" for thermal printers, which skips ReportLab.
+    """
+
+    def __init__(self, output_dir=None, max_workers=2, open_after=False, fmt=None):
+        self.output_dir = output_dir or BILL_OUTPUT_DIR
+        self.open_after = open_after
+        self.fmt = fmt or BILL_FORMAT
+        if self.fmt not in EXTENSIONS:
+            raise ValueError(f"unknown bill format {self.fmt!r}")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bill-render")
+
+    def bill_path(self, order_id=None):
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if order_id is None:
+            name = f"bill_{stamp}_{uuid.uuid4().hex[:8]}"
+        else:
+            name = f"bill_{order_id}_{stamp}"
+        return os.path.join(self.output_dir, name + EXTENSIONS[self.fmt])
+
+    def submit(self, order_items, bill_summary, order_id=None, callback=None):
+        """Queue a bill for rendering.
+
+        The items and summary are copied, so the caller may clear its order
+        straight away. ``callback(future)`` runs on the worker thread once the
+        job finishes; Tk code should poll the future from the main loop instead.
+        """
+        items = [dict(it) for it in order_items]
+        summary = dict(bill_summary)
+        path = self.bill_path(order_id)
+        future = self._executor.submit(self._render, items, summary, path, order_id)
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def submit_batch(self, bills, path):
+        """Queue many bills (dicts as for generate_pdf_batch) into one file."""
+        bills = [dict(b) for b in bills]
+        return self._executor.submit(render_batch, bills, path, self.fmt)
+
+    def _render(self, items, summary, path, order_id=None):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.fmt == "pdf":
+            return generate_pdf_bill(items, summary, filename=path, open_after=self.open_after,
+                                     order_id=order_id)
+        return write_receipt(path, items, summary, order_id, fmt=self.fmt)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def render_batch(bills, path, fmt="pdf"):
+    """Write many bills to one file: a PDF with a page run per bill, or receipts one after another."""
+    if fmt == "pdf":
+        return generate_pdf_batch(bills, path)
+    if fmt == "escpos":
+        with open(path, "wb") as out:
+            for b in bills:
+                out.write(escpos_receipt(b['items'], b['bill'], b.get('order_id'), b.get('created_at')))
+        return path
+    with open(path, "w", encoding="utf-8") as out:
+        for b in bills:
+            out.write(format_receipt(b['items'], b['bill'], b.get('order_id'), b.get('created_at')))
+            out.write("\n")
+    return path
+
+
+def bill_from_order(order):
+    """A saved OrderRow (with items) as a bill dict for reprinting.
+
+    Only the totals are stored, so the per-rate GST lines are not reprinted.
+    """
+    total, gst, discount = order.total_amount or 0, order.gst_amount or 0, order.discount or 0
+    return {
+        'order_id': order.id,
+        'created_at': order.created_at,
+        'items': order.items,
+        'bill': {'subtotal': round(total - gst + discount, 2), 'gst': gst, 'discount': discount, 'total': total},
+    }
+
+
+def saved_bills(order_ids=(), start=None, end=None, conn=None):
+    """Bill dicts for the given order ids, or for every order from start to end (days, inclusive).
+
+    With no ids and no days this is today's orders; with only start, start to today.
+    """
+    if not order_ids:
+        first = str(start or end or date.today())
+        last = date.fromisoformat(str(end or (date.today() if start else first))) + timedelta(days=1)
+        order_ids = [o.id for o in repository.orders_between(first, last, conn)]
+    for order_id in order_ids:
+        order = repository.get_order(order_id, conn)
+        if order is not None:
+            yield bill_from_order(order)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reprint saved bills into one file")
+    parser.add_argument("--order", type=int, action="append", help="order id (repeatable)")
+    parser.add_argument("--from", dest="start", help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="last day, YYYY-MM-DD")
+    parser.add_argument("--format", choices=sorted(EXTENSIONS), default="pdf")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args(argv)
+    bills = list(saved_bills(args.order or (), args.start, args.end))
+    render_batch(bills, args.out, args.format)
+    print(f"{len(bills)} bills written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import threading
+import time
+import uuid
+
+from utils.menu_cache import menu_cache
+from utils.open_order import OpenOrder
+from utils.order_writer import save_order
+
+ORDER_TYPES = ("Dine-In", "Takeaway")
+PAYMENT_METHODS = ("Cash", "Card", "UPI")
+
+# Called with every checkout result (order_id, items, bill, order_type) once
+# the order is saved; listeners must return quickly (e.g. utils.kitchen).
+on_checkout = []
+
+
+class BillingSession:
+    """One open order plus the lock that serialises changes to it."""
+
+    __slots__ = ("id", "order", "lock", "last_used")
+
+    def __init__(self, session_id, default_gst_percent):
+        self.id = session_id
+        self.order = OpenOrder(default_gst_percent)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+class BillingService:
+    """Billing logic with no UI: open orders, pricing and checkout.
+
+    Each front-end (the Tk till, a tablet, a kiosk) opens its own session,
+    so any number of orders can be in progress at once. Sessions are
+    independent; only checkout touches the database. Bad input raises
+    ValueError and unknown sessions raise KeyError.
+    """
+
+    def __init__(self, menu=None, default_gst_percent=5.0):
+        self.menu = menu or menu_cache
+        self.default_gst_percent = default_gst_percent
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    # ---------------------- SESSIONS ----------------------
+
+    def open_session(self):
+        session = BillingSession(uuid.uuid4().hex, self.default_gst_percent)
+        with self._lock:
+            self._sessions[session.id] = session
+        return session.id
+
+    def get_session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise KeyError(f"unknown session {session_id}")
+        session.last_used = time.monotonic()
+        return session
+
+    def close_session(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def expire_idle(self, max_idle_seconds=3600):
+        """Drop sessions untouched for max_idle_seconds; returns how many."""
+        cutoff = time.monotonic() - max_idle_seconds
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if s.last_used < cutoff]
+            for sid in idle:
+                del self._sessions[sid]
+        return len(idle)
+
+    def session_count(self):
+        return len(self._sessions)
+
+    # ---------------------- ORDER EDITING ----------------------
+
+    def resolve_item(self, item_id=None, name=None):
+        """Look up an available menu item by id or name (cache only)."""
+        self.menu.refresh()
+        item = self.menu.get(int(item_id)) if item_id is not None else self.menu.find(name)
+        if item is None or item.available_today != 1:
+            raise ValueError(f"item not available: {item_id if item_id is not None else name}")
+        return item
+
+    def add_item(self, session_id, item_id=None, name=None, quantity=1):
+        if quantity <= 0:
+            raise ValueError("quantity must be positive")
+        item = self.resolve_item(item_id, name)
+        session = self.get_session(session_id)
+        with session.lock:
+            return session.order.add(item, quantity)
+
+    def set_quantity(self, session_id, item_id, quantity):
+        session = self.get_session(session_id)
+        with session.lock:
+            if item_id not in [line.id for line in session.order]:
+                raise ValueError(f"item {item_id} is not on the order")
+            return session.order.set_quantity(item_id, quantity)
+
+    def remove_item(self, session_id, item_id):
+        session = self.get_session(session_id)
+        with session.lock:
+            return session.order.remove(item_id)
+
+    def totals(self, session_id, discount_percent=0.0):
+        session = self.get_session(session_id)
+        with session.lock:
+            return session.order.totals(discount_percent)
+
+    def snapshot(self, session_id, discount_percent=0.0):
+        session = self.get_session(session_id)
+        with session.lock:
+            return {'session_id': session_id, 'items': session.order.items(),
+                    'bill': session.order.totals(discount_percent)}
+
+    # ---------------------- CHECKOUT ----------------------
+
+    def checkout(self, session_id, order_type="Dine-In", payment_method="Cash", discount_percent=0.0,
+                 tab=None):
+        """Price and store the session's order, then empty it for the next one."""
+        if order_type not in ORDER_TYPES:
+            raise ValueError(f"unknown order type: {order_type}")
+        if payment_method not in PAYMENT_METHODS:
+            raise ValueError(f"unknown payment method: {payment_method}")
+        session = self.get_session(session_id)
+        with session.lock:
+            if not session.order:
+                raise ValueError("order is empty")
+            items = session.order.items()
+            bill = session.order.totals(discount_percent)
+            order_id = save_order(order_type, payment_method, bill, items, tab=tab)
+            session.order.clear()
+        result = {'order_id': order_id, 'items': items, 'bill': bill, 'order_type': order_type}
+        for listener in on_checkout:
+            listener(result)
+        return result
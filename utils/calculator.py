@@ -1,13 +1,172 @@
+from utils.metrics import instrument
 
 
+class GstSlabs:
+    """Order lines grouped by GST rate, kept current as lines change.
+
+    Each line is stored under a caller-chosen key. Adding a new line only
+    adds its amount to its slab's running taxable value; changing or
+    removing a line marks that one slab for a re-sum. summary() then
+    produces the bill without walking every line again.
+    """
+
+    def __init__(self, default_gst_percent=5.0):
+        self.default_gst_percent = default_gst_percent
+        self._lines = {}      # key -> rate
+        self._order = {}      # key -> position the line was first added at
+        self._slabs = {}      # rate -> {key: amount}
+        self._next = 0
+        self._taxable = {}    # rate -> running taxable value
+        self._stale = set()
+
+    def rate_for(self, item):
+        rate = item.get('gst_percent')
+        return float(self.default_gst_percent if rate is None else rate)
+
+    def set_line(self, key, item):
+        rate = self.rate_for(item)
+        amount = item['price'] * item['quantity']
+        old_rate = self._lines.get(key)
+        if old_rate is None:
+            self._order[key] = self._next
+            self._next += 1
+        elif old_rate != rate:
+            self._detach(key, old_rate)
+        slab = self._slabs.setdefault(rate, {})
+        self._lines[key] = rate
+        slab[key] = amount
+        if old_rate is None and rate not in self._stale:
+            # appended line: extend the running sum, same as sum() would
+            self._taxable[rate] = self._taxable.get(rate, 0) + amount
+        else:
+            self._stale.add(rate)
+
+    def remove_line(self, key):
+        rate = self._lines.pop(key, None)
+        if rate is not None:
+            del self._order[key]
+            self._detach(key, rate)
+
+    def _detach(self, key, rate):
+        slab = self._slabs[rate]
+        del slab[key]
+        if slab:
+            self._stale.add(rate)
+        else:
+            del self._slabs[rate]
+            self._taxable.pop(rate, None)
+            self._stale.discard(rate)
+
+    def clear(self):
+        self._lines.clear()
+        self._order.clear()
+        self._slabs.clear()
+        self._taxable.clear()
+        self._stale.clear()
+
+    def _slab_totals(self):
+        for rate in self._stale:
+            # re-sum in line order so the result matches a from-scratch bill
+            slab = self._slabs[rate]
+            self._taxable[rate] = sum(slab[key] for key in sorted(slab, key=self._order.get))
+        self._stale.clear()
+        return [(rate, self._taxable[rate]) for rate in sorted(self._taxable)]
+
+    def summary(self, discount_percent=0.0):
+        slabs = [(rate, taxable, taxable * (rate / 100)) for rate, taxable in self._slab_totals()]
+        subtotal = sum(taxable for _, taxable, _ in slabs)
+        gst = sum(tax for _, _, tax in slabs)
+        discount = subtotal * (discount_percent / 100)
+        total = subtotal + gst - discount
+        return {
+            "subtotal": round(subtotal, 2),
+            "gst": round(gst, 2),
+            "discount": round(discount, 2),
+            "total": round(total, 2),
+            "gst_breakdown": [
+                {"gst_percent": rate, "taxable": round(taxable, 2), "gst": round(tax, 2)}
+                for rate, taxable, tax in slabs
+            ],
+        }
+
+
+@instrument(db=False)
 def calculate_bill(items, gst_percent=5.0, discount_percent=0.0):
-    subtotal = sum(item['price'] * item['quantity'] for item in items)
-    gst = subtotal * (gst_percent / 100)
-    discount = subtotal * (discount_percent / 100)
+    """Bill for a list of items, taxing each at its own gst_percent.
+
+    gst_percent is the rate used for items that do not carry one.
+    """
+    slabs = GstSlabs(gst_percent)
+    for i, item in enumerate(items):
+        slabs.set_line(i, item)
+    return slabs.summary(discount_percent)
+
+# ---------------------- BULK (COLUMNAR) CALCULATION ----------------------
+
+def _round2(values):
+    # Python's round() on each value, so results match calculate_bill exactly
+    # (np.round scales by 100 first and can differ on halfway cases).
+    import numpy as np
+    return np.array([round(v, 2) for v in values.tolist()], dtype=np.float64)
+
+
+@instrument(db=False)
+def calculate_bills_bulk(order_ids, prices, quantities, gst_percents=5.0, discount_percents=0.0):
+    """Price many orders at once from flat, per-line columns.
+
+    order_ids, prices and quantities hold one entry per order line.
+    gst_percents may be a scalar or one rate per line; discount_percents a
+    scalar or one value per line (the first line of each order is used).
+    Lines are grouped into per-order GST slabs with NumPy, summing in line
+    order and then slab by slab in rate order, exactly as GstSlabs does,
+    so every order gets the same figures as calculate_bill.
+
+    Returns a dict of arrays keyed like calculate_bill plus "order_id",
+    one entry per distinct order id in ascending order.
+    """
+    import numpy as np
+
+    order_ids = np.asarray(order_ids)
+    prices = np.asarray(prices, dtype=np.float64)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    n = len(order_ids)
+    rates = np.broadcast_to(np.asarray(gst_percents, dtype=np.float64), (n,))
+    discounts = np.broadcast_to(np.asarray(discount_percents, dtype=np.float64), (n,))
+
+    unique_ids, first_line, order_idx = np.unique(order_ids, return_index=True, return_inverse=True)
+    order_idx = order_idx.reshape(-1)
+    n_orders = len(unique_ids)
+    line_totals = prices * quantities
+
+    # Slabs come back sorted by (order, rate); bincount accumulates weights in
+    # array order, i.e. like sum() over the lines and then over the slabs.
+    slabs, slab_idx = np.unique(np.column_stack([order_idx, rates]), axis=0, return_inverse=True)
+    slab_idx = slab_idx.reshape(-1)
+    slab_order = slabs[:, 0].astype(np.int64)
+    slab_taxable = np.bincount(slab_idx, weights=line_totals, minlength=len(slabs))
+    slab_gst = slab_taxable * (slabs[:, 1] / 100)
+    subtotal = np.bincount(slab_order, weights=slab_taxable, minlength=n_orders)
+    gst = np.bincount(slab_order, weights=slab_gst, minlength=n_orders)
+
+    discount = subtotal * (discounts[first_line] / 100)
     total = subtotal + gst - discount
     return {
-        "subtotal": round(subtotal, 2),
-        "gst": round(gst, 2),
-        "discount": round(discount, 2),
-        "total": round(total, 2)
+        "order_id": unique_ids,
+        "subtotal": _round2(subtotal),
+        "gst": _round2(gst),
+        "discount": _round2(discount),
+        "total": _round2(total),
     }
+
+
+def bills_to_columns(bills, gst_percent=5.0, discount_percent=0.0):
+    """Flatten sample_bills.json-style bills into calculate_bills_bulk columns."""
+    order_ids, prices, quantities, rates, discounts = [], [], [], [], []
+    for bill in bills:
+        for item in bill['items']:
+            order_ids.append(bill['order_id'])
+            prices.append(item['price'])
+            quantities.append(item['quantity'])
+            rates.append(gst_percent if item.get('gst_percent') is None else item['gst_percent'])
+            discounts.append(bill.get('discount_percent', discount_percent))
+    return order_ids, prices, quantities, rates, discounts
@@ -0,0 +1,158 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get("RESTAURANT_DB", "db/restaurant.db")
+
+# Several tills may share one database file. A writer that finds it locked
+# waits up to BUSY_TIMEOUT_MS inside SQLite, and retry_busy() then retries
+# the whole transaction with backoff.
+BUSY_TIMEOUT_MS = int(os.environ.get("BILLING_BUSY_TIMEOUT_MS", "5000"))
+RETRY_ATTEMPTS = 6
+RETRY_BASE_DELAY = 0.02
+
+# Tuning applied once to every pooled connection.
+PRAGMAS = (
+    ("busy_timeout", BUSY_TIMEOUT_MS),
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),      # ~16 MB page cache
+    ("mmap_size", 268435456),    # 256 MB memory-mapped I/O
+    ("temp_store", "MEMORY"),
+)
+
+# sqlite3 keeps compiled statements in a per-connection LRU cache; since
+# connections now live for the whole process, every helper's SQL is parsed once.
+STATEMENT_CACHE_SIZE = 256
+
+# Callables run on every new pooled connection (e.g. metrics SQL tracing).
+on_connect = []
+
+_local = threading.local()
+_all_connections = []
+_lock = threading.Lock()
+
+
+def set_db_path(path):
+    """Point the pool at another database (closes existing connections)."""
+    global DB_PATH
+    close_all()
+    DB_PATH = path
+
+
+def _open(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # check_same_thread is off only so close_all() can shut connections from
+    # any thread; get_connection() never hands a connection to another thread.
+    conn = sqlite3.connect(path, cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000)
+    retry_busy(_tune, conn)     # switching to WAL needs a moment of exclusive access
+    for hook in on_connect:
+        hook(conn)
+    return conn
+
+
+def _tune(conn):
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+
+
+def get_connection(db_path=None):
+    """Return this thread's long-lived connection to db_path.
+
+    Connections are thread-affine: each thread gets its own connection per
+    database file and keeps reusing it. Using it as a context manager
+    (``with get_connection() as conn``) commits or rolls back the current
+    transaction without closing the connection.
+    """
+    path = db_path or DB_PATH
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _open(path)
+        with _lock:
+            _close_dead_threads()
+            _all_connections.append((threading.current_thread(), conns, path, conn))
+    return conn
+
+
+def peek_connection(db_path=None):
+    """This thread's pooled connection to db_path if one is already open, else None."""
+    return getattr(_local, "conns", {}).get(db_path or DB_PATH)
+
+
+def pooled_connections():
+    """Every open pooled connection, across all threads."""
+    with _lock:
+        return [entry[3] for entry in _all_connections]
+
+
+def _close_dead_threads():
+    # Short-lived worker threads (e.g. per-request server threads) would
+    # otherwise leave their connections open forever. Caller holds _lock.
+    alive = []
+    for entry in _all_connections:
+        if entry[0].is_alive():
+            alive.append(entry)
+        else:
+            entry[3].close()
+    _all_connections[:] = alive
+
+
+def close_all():
+    """Close every pooled connection, across all threads."""
+    with _lock:
+        entries = list(_all_connections)
+        _all_connections.clear()
+    for _, conns, path, conn in entries:
+        conns.pop(path, None)
+        conn.close()
+
+
+# ---------------------- WRITE TRANSACTIONS ----------------------
+
+def is_busy_error(exc):
+    message = str(exc).lower()
+    return isinstance(exc, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+@contextmanager
+def immediate(conn):
+    """Run the block in a BEGIN IMMEDIATE transaction.
+
+    The write lock is taken up front, so the transaction cannot fail
+    half-way when it upgrades from reading to writing. Inside a transaction
+    that is already open, the block simply joins it.
+    """
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def retry_busy(fn, *args, attempts=None, **kwargs):
+    """Call fn, retrying with jittered exponential backoff while the database is locked.
+
+    fn must run a whole transaction, so a retry starts it again from scratch.
+    """
+    attempts = attempts or RETRY_ATTEMPTS
+    for attempt in range(attempts):
+        try:
+            return fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or attempt == attempts - 1:
+                raise
+            time.sleep(RETRY_BASE_DELAY * (2 ** attempt) * (0.5 + random.random()))
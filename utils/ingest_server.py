@@ -0,0 +1,225 @@
+"""asyncio ingestion server for online / aggregator orders.
+
+Clients connect over a local TCP (or Unix) socket and send one JSON order
+per line, shaped like the entries in data/sample_bills.json:
+
+    {"order_id": "ZOM-123", "items": [{"name": "Pizza", "quantity": 2}],
+     "payment_method": "UPI", "order_type": "Takeaway", "discount_percent": 0}
+
+Each line gets one JSON reply: {"ok": true, "ref": ..., "order_id": ...}
+or {"ok": false, "ref": ..., "error": ...}. Sending {"cmd": "stats"}
+returns the throughput/latency counters.
+
+Run with ``python -m utils.ingest_server --port 9090``.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import db_pool
+from utils.billing_service import ORDER_TYPES, PAYMENT_METHODS
+from utils.calculator import calculate_bill
+from utils.menu_cache import menu_cache
+from utils.menu_watch import MenuChangeWatcher
+from utils.order_writer import build_order, write_orders
+
+
+class IngestStats:
+    """Counters plus a sliding window of enqueue-to-commit latencies."""
+
+    def __init__(self, window=10000):
+        self.started = time.monotonic()
+        self.received = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.latencies = collections.deque(maxlen=window)
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def snapshot(self, queue_depth=0):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            'received': self.received,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'written': self.written,
+            'failed': self.failed,
+            'batches': self.batches,
+            'queue_depth': queue_depth,
+            'orders_per_sec': round(self.written / elapsed, 2),
+            'latency_ms': {f"p{p}": round(self.percentile(p) * 1000, 3) for p in (50, 95, 99)},
+        }
+
+
+class IngestServer:
+    """Validates, prices and stores incoming orders.
+
+    Connection handlers validate against the in-memory menu and price with
+    calculate_bill, then put the order on a bounded queue. A single writer
+    task drains the queue and commits batches on one dedicated DB thread.
+    When the queue is full, handlers stop reading from their sockets until
+    it drains, so producers are slowed down instead of piling up in memory.
+    """
+
+    def __init__(self, queue_size=1000, max_batch=200, max_connections=256,
+                 default_gst_percent=5.0, strict_prices=True, db_path=None):
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.max_connections = max_connections
+        self.default_gst_percent = default_gst_percent
+        self.strict_prices = strict_prices
+        self.db_path = db_path
+        self.stats = IngestStats()
+        self._queue = None
+        self._slots = None
+        self._writer_task = None
+        self._db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-writer")
+
+    # ---------------------- VALIDATION / PRICING ----------------------
+
+    def price_order(self, payload):
+        """Turn a client order into a storable order, or raise ValueError."""
+        if not isinstance(payload, dict) or not payload.get('items'):
+            raise ValueError("order has no items")
+        order_type = payload.get('order_type', 'Takeaway')
+        payment = payload.get('payment_method', 'UPI')
+        if order_type not in ORDER_TYPES:
+            raise ValueError(f"unknown order type: {order_type}")
+        if payment not in PAYMENT_METHODS:
+            raise ValueError(f"unknown payment method: {payment}")
+        menu_cache.refresh()
+        items = []
+        for entry in payload['items']:
+            if not isinstance(entry, dict):
+                raise ValueError(f"order item is not an object: {entry!r}")
+            item = menu_cache.get(entry['id']) if 'id' in entry else menu_cache.find(entry.get('name'))
+            if item is None or item.available_today != 1:
+                raise ValueError(f"item not available: {entry.get('name', entry.get('id'))}")
+            quantity = entry.get('quantity')
+            if not isinstance(quantity, int) or quantity <= 0:
+                raise ValueError(f"bad quantity for {item.name}")
+            if self.strict_prices and 'price' in entry and float(entry['price']) != item.price:
+                raise ValueError(f"price mismatch for {item.name}: {entry['price']} != {item.price}")
+            items.append({'id': item.id, 'name': item.name, 'category': item.category, 'price': item.price,
+                          'gst_percent': item.gst_percent, 'quantity': quantity})
+        bill = calculate_bill(items, self.default_gst_percent, float(payload.get('discount_percent', 0.0)))
+        return build_order(order_type, payment, bill, items)
+
+    # ---------------------- WRITER ----------------------
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            orders = [order for order, _, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._db_thread, self._write, orders)
+            except Exception as e:
+                results = [e] * len(batch)
+            self.stats.batches += 1
+            now = time.monotonic()
+            for (_, future, queued_at), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    self.stats.failed += 1
+                    future.set_exception(result)
+                else:
+                    self.stats.written += 1
+                    self.stats.latencies.append(now - queued_at)
+                    future.set_result(result)
+                self._queue.task_done()
+
+    def _write(self, orders):
+        return write_orders(orders, db_pool.get_connection(self.db_path))
+
+    # ---------------------- CONNECTIONS ----------------------
+
+    async def submit(self, payload):
+        """Validate, price and store one order; returns the reply dict."""
+        self.stats.received += 1
+        ref = payload.get('order_id') if isinstance(payload, dict) else None
+        try:
+            order = self.price_order(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            self.stats.rejected += 1
+            return {'ok': False, 'ref': ref, 'error': str(e)}
+        self.stats.accepted += 1
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((order, future, time.monotonic()))  # blocks while full
+        try:
+            order_id = await future
+        except Exception as e:
+            return {'ok': False, 'ref': ref, 'error': f"write failed: {e}"}
+        return {'ok': True, 'ref': ref, 'order_id': order_id, 'total': order['total_amount']}
+
+    async def handle(self, reader, writer):
+        async with self._slots:
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    try:
+                        payload = json.loads(line)
+                    except ValueError:
+                        reply = {'ok': False, 'error': "invalid JSON"}
+                    else:
+                        if isinstance(payload, dict) and payload.get('cmd') == 'stats':
+                            reply = self.stats.snapshot(self._queue.qsize())
+                        else:
+                            reply = await self.submit(payload)
+                    writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+    async def start(self, host="127.0.0.1", port=9090, unix_path=None):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._slots = asyncio.Semaphore(self.max_connections)
+        self._writer_task = asyncio.create_task(self._writer())
+        if unix_path:
+            return await asyncio.start_unix_server(self.handle, path=unix_path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serve_forever(self, host="127.0.0.1", port=9090, unix_path=None):
+        server = await self.start(host, port, unix_path)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    from utils.db_utils import setup_tables
+
+    parser = argparse.ArgumentParser(description="Online order ingestion server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--unix", help="listen on a Unix socket path instead of TCP")
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--max-batch", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_tables()
+    MenuChangeWatcher().start()  # menu edits from the tills reach this process's cache
+    server = IngestServer(queue_size=args.queue_size, max_batch=args.max_batch)
+    print(f"Ingesting orders on {args.unix or f'{args.host}:{args.port}'}")
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""Kitchen order tickets (KOTs): split each checkout by station and deliver it.
+
+    python -m utils.kitchen display bar                 # a station screen, over the local socket
+    python -m utils.kitchen display '*' --port 9191     # the pass: every station
+
+The till calls KitchenBus.attach(). After that, every checkout is split by
+menu category into one ticket per station (see ROUTES). The tickets are
+handed to that station's subscribers. Publishing only puts the order on
+a queue, and a dispatcher thread does the splitting and delivery, so the
+billing UI never waits on a station.
+
+A station marks a ticket done with ``bump()``. That gives each station a
+prep-time series (metrics op ``kitchen.prep.<station>``) and a live backlog
+of open tickets. Tickets never bumped are dropped ("expire") once the
+business day changes, and the oldest go when more than MAX_OPEN are open.
+
+serve() exposes the bus over a local socket as JSON lines, so station
+screens can run as separate processes. The till only serves when
+BILLING_KITCHEN_SERVE=1 (TCP on BILLING_KITCHEN_PORT) or
+BILLING_KITCHEN_SOCKET names a unix socket path; see serve_configured().
+A client sends ``{"station": "bar"}`` and then receives
+``{"event": "ticket"|"bump"|"expire", "ticket": {...}}`` lines. It may
+send ``{"bump": "<ticket id>"}`` back.
+"""
+import argparse
+import errno
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+from utils import billing_service
+from utils.metrics import registry
+
+KITCHEN_PORT = int(os.environ.get("BILLING_KITCHEN_PORT", "9191"))
+KITCHEN_SERVE = os.environ.get("BILLING_KITCHEN_SERVE") == "1"
+KITCHEN_SOCKET = os.environ.get("BILLING_KITCHEN_SOCKET")     # unix socket path instead of TCP
+ALL_STATIONS = "*"          # subscribe to every station (the pass / expo screen)
+DEFAULT_STATION = "kitchen"
+MAX_OPEN = int(os.environ.get("BILLING_KITCHEN_MAX_OPEN", "500"))    # oldest open tickets beyond this are dropped
+
+# menu category -> station; categories not listed go to DEFAULT_STATION.
+ROUTES = {
+    "Main Course": "kitchen",
+    "Snacks": "kitchen",
+    "Bread": "tandoor",
+    "Beverage": "bar",
+    "Dessert": "dessert",
+}
+
+
+class Ticket:
+    """The part of one order that a single station prepares."""
+
+    __slots__ = ("id", "day", "number", "station", "order_id", "order_type", "lines", "created_at",
+                 "published", "done")
+
+    def __init__(self, number, station, order_id, order_type, lines, day=None):
+        self.day = day or date.today()
+        # numbers restart daily; the date keeps a ticket left open overnight distinct
+        self.id = f"{self.day:%Y%m%d}-{number}-{station}"
+        self.number = number
+        self.station = station
+        self.order_id = order_id
+        self.order_type = order_type
+        self.lines = lines          # [(name, quantity)]
+        self.created_at = datetime.now().strftime("%H:%M:%S")
+        self.published = time.monotonic()
+        self.done = None
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    @property
+    def age(self):
+        return (self.done or time.monotonic()) - self.published
+
+    def as_dict(self):
+        return {'id': self.id, 'day': self.day.isoformat(), 'number': self.number, 'station': self.station,
+                'order_id': self.order_id, 'order_type': self.order_type, 'lines': self.lines, 'created_at': self.created_at,
+                'age': round(self.age, 1), 'done': self.done is not None}
+
+    def __repr__(self):
+        return f"Ticket({self.id!r}, {self.lines})"
+
+
+class Subscription:
+    """A station's feed: (event, Ticket) pairs, pulled with get() or pushed to a callback."""
+
+    def __init__(self, bus, station, callback=None):
+        self.bus = bus
+        self.station = station
+        self.callback = callback
+        self.queue = queue.SimpleQueue()
+
+    def deliver(self, event, ticket):
+        if self.callback is not None:
+            try:
+                self.callback(event, ticket)
+            except Exception:
+                pass    # a broken screen must not stop delivery to the others
+        else:
+            self.queue.put((event, ticket))
+
+    def get(self, timeout=None):
+        """The next (event, ticket); raises queue.Empty after timeout seconds."""
+        return self.queue.get(timeout=timeout)
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class KitchenBus:
+    """In-process pub/sub of kitchen tickets, routed by menu category."""
+
+    def __init__(self, routes=None, default_station=DEFAULT_STATION, max_open=None):
+        self.routes = dict(ROUTES if routes is None else routes)
+        self.default_station = default_station
+        self.max_open = MAX_OPEN if max_open is None else max_open
+        self._subs = {}             # station -> [Subscription]
+        self._open = {}             # ticket id -> Ticket, oldest first
+        self._lock = threading.Lock()
+        self._inbox = queue.SimpleQueue()
+        self._day = date.today()
+        self._numbers = itertools.count(1)
+        self._thread = threading.Thread(target=self._run, name="kitchen-bus", daemon=True)
+        self._thread.start()
+
+    # ---------------------- PUBLISHING ----------------------
+
+    def station_for(self, category):
+        return self.routes.get(category or "", self.default_station)
+
+    def publish(self, items, order_id=None, order_type=None):
+        """Queue an order's items (dicts with name, category, quantity) for the stations."""
+        self._inbox.put(([(it['name'], it.get('category'), it['quantity']) for it in items], order_id, order_type))
+
+    def on_checkout(self, result):
+        self.publish(result['items'], result['order_id'], result.get('order_type'))
+
+    def attach(self):
+        """Publish every BillingService checkout from now on."""
+        if self.on_checkout not in billing_service.on_checkout:
+            billing_service.on_checkout.append(self.on_checkout)
+        return self
+
+    def detach(self):
+        if self.on_checkout in billing_service.on_checkout:
+            billing_service.on_checkout.remove(self.on_checkout)
+
+    def close(self):
+        self.detach()
+        self._inbox.put(None)
+        self._thread.join()
+
+    def _next_number(self):
+        if date.today() != self._day:     # KOT numbers start again every day
+            self._day = date.today()
+            self._numbers = itertools.count(1)
+        return next(self._numbers)
+
+    def _run(self):
+        while True:
+            entry = self._inbox.get()
+            if entry is None:
+                return
+            lines, order_id, order_type = entry
+            by_station = {}
+            for name, category, quantity in lines:
+                by_station.setdefault(self.station_for(category), []).append((name, quantity))
+            number = self._next_number()
+            for station, station_lines in by_station.items():
+                ticket = Ticket(number, station, order_id, order_type, station_lines, self._day)
+                with self._lock:
+                    self._open[ticket.id] = ticket
+                    expired = self._expire(ticket.day)
+                    subs = self._subscribers(station)
+                for old, old_subs in expired:
+                    for sub in old_subs:
+                        sub.deliver("expire", old)
+                for sub in subs:
+                    sub.deliver("ticket", ticket)
+
+    def _expire(self, day):
+        # caller holds _lock. Tickets nobody bumped must not pile up all day (or for days):
+        # drop those from earlier business days, then the oldest beyond max_open.
+        old = [t for t in self._open.values() if t.day != day]
+        today = [t for t in self._open.values() if t.day == day]     # oldest first
+        old += today[:max(0, len(today) - self.max_open)]
+        for ticket in old:
+            del self._open[ticket.id]
+        return [(ticket, self._subscribers(ticket.station)) for ticket in old]
+
+    def _subscribers(self, station):
+        # caller holds _lock, so a new subscriber gets a ticket either here or in its backlog, not both
+        return self._subs.get(station, []) + self._subs.get(ALL_STATIONS, [])
+
+    # ---------------------- STATIONS ----------------------
+
+    def subscribe(self, station, callback=None):
+        """Follow one station's tickets (ALL_STATIONS for every station).
+
+        Tickets already open for the station are delivered first, so a screen
+        that restarts picks up where it left off.
+        """
+        sub = Subscription(self, station, callback)
+        with self._lock:
+            self._subs.setdefault(station, []).append(sub)
+            backlog = [t for t in self._open.values() if station in (ALL_STATIONS, t.station)]
+        for ticket in backlog:
+            sub.deliver("ticket", ticket)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subs.get(sub.station, [])
+            if sub in subs:
+                subs.remove(sub)
+
+    def bump(self, ticket_id):
+        """Mark a ticket done; returns it, or None if it was not open."""
+        with self._lock:
+            ticket = self._open.pop(ticket_id, None)
+            if ticket is None:
+                return None
+            subs = self._subscribers(ticket.station)
+        ticket.done = time.monotonic()
+        registry.record(f"kitchen.prep.{ticket.station}", ticket.done - ticket.published)
+        for sub in subs:
+            sub.deliver("bump", ticket)
+        return ticket
+
+    def open_tickets(self, station=None):
+        """Open tickets, oldest first."""
+        with self._lock:
+            return [t for t in self._open.values() if station in (None, ALL_STATIONS, t.station)]
+
+    def backlog(self):
+        """{station: (open tickets, age of the oldest in seconds)}."""
+        now = time.monotonic()
+        out = {}
+        for ticket in self.open_tickets():
+            count, oldest = out.get(ticket.station, (0, 0.0))
+            out[ticket.station] = (count + 1, max(oldest, now - ticket.published))
+        return out
+
+
+# ---------------------- SOCKET TRANSPORT ----------------------
+
+class _StationHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            hello = json.loads(self.rfile.readline() or b"{}")
+            station = hello.get("station") if isinstance(hello, dict) else None
+        except (OSError, ValueError):
+            return
+        sub = self.server.bus.subscribe(station or ALL_STATIONS)
+        # a writer thread per screen, so a slow screen only delays itself
+        writer = threading.Thread(target=self._send, args=(sub,), daemon=True)
+        writer.start()
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                if "bump" in message:
+                    self.server.bus.bump(message["bump"])
+        except (OSError, ValueError):
+            pass
+        finally:
+            sub.close()
+            sub.queue.put(None)
+            writer.join()
+
+    def _send(self, sub):
+        while True:
+            entry = sub.get()
+            if entry is None:
+                return
+            event, ticket = entry
+            try:
+                self.wfile.write(json.dumps({'event': event, 'ticket': ticket.as_dict()}).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            except OSError:
+                return
+
+
+class _TCPStationServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(bus, host="127.0.0.1", port=None, unix_path=None):
+    """Serve the bus to station screens on a background thread; returns the server."""
+    if unix_path:
+        if os.path.exists(unix_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(unix_path)
+            except OSError:
+                os.remove(unix_path)    # left behind by a till that stopped
+            else:
+                raise OSError(errno.EADDRINUSE, f"{unix_path} is served by another process")
+            finally:
+                probe.close()
+        server = socketserver.ThreadingUnixStreamServer(unix_path, _StationHandler)
+        server.daemon_threads = True
+    else:
+        server = _TCPStationServer((host, port or KITCHEN_PORT), _StationHandler)
+    server.bus = bus
+    threading.Thread(target=server.serve_forever, name="kitchen-serve", daemon=True).start()
+    return server
+
+
+def serve_configured(bus):
+    """serve() as BILLING_KITCHEN_SERVE / BILLING_KITCHEN_SOCKET ask; None when neither is set.
+
+    Raises OSError if the address is taken, e.g. by another till on this machine.
+    """
+    if KITCHEN_SOCKET:
+        return serve(bus, unix_path=KITCHEN_SOCKET)
+    if KITCHEN_SERVE:
+        return serve(bus)
+    return None
+
+
+def format_ticket(ticket):
+    lines = [f"KOT #{ticket['number']}  {ticket['station'].upper()}  {ticket['order_type'] or ''}  "
+             f"{ticket['created_at']}  [{ticket['id']}]"]
+    lines += [f"  {qty:>3} x {name}" for name, qty in ticket['lines']]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kitchen station display")
+    sub = parser.add_subparsers(dest="action", required=True)
+    display = sub.add_parser("display", help="print a station's tickets; type a ticket id to bump it")
+    display.add_argument("station", nargs="?", default=ALL_STATIONS)
+    display.add_argument("--host", default="127.0.0.1")
+    display.add_argument("--port", type=int, default=KITCHEN_PORT)
+    display.add_argument("--unix", help="unix socket path instead of TCP")
+    args = parser.parse_args(argv)
+
+    if args.unix:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(args.unix)
+    else:
+        conn = socket.create_connection((args.host, args.port))
+    conn.sendall(json.dumps({'station': args.station}).encode("utf-8") + b"\n")
+
+    def read_bumps():
+        for line in sys.stdin:
+            if line.strip():
+                conn.sendall(json.dumps({'bump': line.strip()}).encode("utf-8") + b"\n")
+    threading.Thread(target=read_bumps, daemon=True).start()
+
+    for line in conn.makefile("r", encoding="utf-8"):
+        message = json.loads(line)
+        ticket = message['ticket']
+        if message['event'] == "ticket":
+            print(format_ticket(ticket), flush=True)
+        elif message['event'] == "expire":
+            print(f"-- dropped [{ticket['id']}] (never bumped)", flush=True)
+        else:
+            print(f"-- done [{ticket['id']}] after {ticket['age']:.0f}s", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import threading
+
+from utils import db_pool
+from utils.repository import MenuItem, get_menu_items, list_menu, on_menu_change
+
+
+class MenuCache:
+    """In-memory copy of the menu, indexed by id and by name.
+
+    Menu writes in utils.repository call ``invalidate(item_id)``, which bumps
+    ``generation``. ``refresh()`` then re-reads only the rows that changed
+    since the last load; lookups (``get``, ``find``, ``available``) never
+    touch the database.
+    """
+
+    def __init__(self):
+        self.generation = 1
+        self._loaded_generation = 0
+        self._dirty = None          # None = reload everything
+        self._by_id = {}
+        self._by_name = {}
+        self._available = []
+        self._lock = threading.Lock()
+
+    def invalidate(self, item_id=None):
+        """Mark one item (or, with no id, the whole menu) as changed."""
+        with self._lock:
+            if item_id is None:
+                self._dirty = None
+            elif self._dirty is not None:
+                self._dirty.add(int(item_id))
+            self.generation += 1
+
+    def is_stale(self):
+        return self._loaded_generation != self.generation
+
+    def refresh(self, conn=None):
+        """Reload changed rows if the cache is stale. Returns True if it was."""
+        with self._lock:
+            if not self.is_stale():
+                return False
+            conn = conn or db_pool.get_connection()
+            if self._dirty is None:
+                self._by_id = {it.id: it for it in list_menu(conn=conn)}
+            elif self._dirty:
+                for item_id in self._dirty:
+                    self._by_id.pop(item_id, None)
+                for it in get_menu_items(self._dirty, conn):
+                    self._by_id[it.id] = it
+            self._reindex()
+            self._dirty = set()
+            self._loaded_generation = self.generation
+            return True
+
+    def _reindex(self):
+        available = [it for it in self._by_id.values() if it.available_today == 1]
+        available.sort(key=lambda it: (it.category, it.name))
+        self._available = available
+        self._by_name = {it.name: it for it in available}
+
+    def get(self, item_id):
+        return self._by_id.get(item_id)
+
+    def find(self, name):
+        """Available item with this exact name, or None."""
+        return self._by_name.get(name)
+
+    def available(self):
+        """Items available today, ordered by category then name."""
+        return list(self._available)
+
+    def all_items(self):
+        return list(self._by_id.values())
+
+
+menu_cache = MenuCache()
+on_menu_change.append(menu_cache.invalidate)
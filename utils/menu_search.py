@@ -0,0 +1,108 @@
+import heapq
+import re
+from bisect import bisect_left
+
+_WORD = re.compile(r"[0-9a-z]+")
+PREFIX_CACHE_SIZE = 512
+
+
+def words(text):
+    return _WORD.findall((text or "").lower())
+
+
+class MenuSearchIndex:
+    """Prefix and fuzzy search over menu item names and categories.
+
+    Every word of an item's name and category goes into one sorted list, so a
+    prefix lookup is a bisect plus a short scan. A query matches an item when
+    each query word is a prefix of one of the item's words ("chi tik" finds
+    "Chicken Tikka"). Results come in three groups: names starting with the
+    query, then names with a word starting with it, then category-only
+    matches. Each group is in name order. If nothing matches that way, the
+    query is tried as a subsequence of the item names instead, so "pnrtk"
+    still finds "Paneer Tikka". Build a new index whenever the menu changes;
+    it is not updated in place.
+    """
+
+    def __init__(self, items=()):
+        self._given = list(items)
+        keyed = sorted(((" ".join(words(it['name'])), it) for it in self._given), key=lambda pair: pair[0])
+        self.items = [it for _, it in keyed]          # in name order; postings hold positions here
+        self._names = [name for name, _ in keyed]
+        name_postings, all_postings = {}, {}
+        for i, it in enumerate(self.items):
+            for word in words(it['name']):
+                name_postings.setdefault(word, set()).add(i)
+                all_postings.setdefault(word, set()).add(i)
+            for word in words(it.get('category')):
+                all_postings.setdefault(word, set()).add(i)
+        self._words = sorted(all_postings)
+        self._name_postings = [name_postings.get(w, ()) for w in self._words]
+        self._all_postings = [all_postings[w] for w in self._words]
+        # one string to scan with a single regex for fuzzy matches
+        self._blob = "\n".join(name.replace(" ", "") for name in self._names)
+        self._line_starts = []
+        pos = 0
+        for name in self._names:
+            self._line_starts.append(pos)
+            pos += len(name.replace(" ", "")) + 1
+        self._prefix_cache = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def _with_prefix(self, prefix):
+        """(name hits, name-or-category hits) for items with a word starting with prefix."""
+        cached = self._prefix_cache.get(prefix)
+        if cached is None:
+            in_name, anywhere = set(), set()
+            i = bisect_left(self._words, prefix)
+            while i < len(self._words) and self._words[i].startswith(prefix):
+                in_name.update(self._name_postings[i])
+                anywhere |= self._all_postings[i]
+                i += 1
+            if len(self._prefix_cache) >= PREFIX_CACHE_SIZE:
+                self._prefix_cache.clear()
+            self._prefix_cache[prefix] = cached = (frozenset(in_name), frozenset(anywhere))
+        return cached
+
+    def _fuzzy(self, letters, limit):
+        """Positions of names containing the letters in order, tightest match first."""
+        pattern = re.compile("[^\n]*?".join(re.escape(ch) for ch in letters))
+        found, seen = [], set()
+        for m in pattern.finditer(self._blob):
+            i = bisect_left(self._line_starts, m.start() + 1) - 1
+            if i not in seen:
+                seen.add(i)
+                found.append((m.end() - m.start(), i))
+        return [i for _, i in (heapq.nsmallest(limit, found) if limit else sorted(found))]
+
+    def search(self, query, limit=50):
+        """Best matching items for the query; every item when it is blank."""
+        terms = words(query)
+        if not terms:
+            return self._given[:limit] if limit else list(self._given)
+        in_name, hits = self._with_prefix(terms[0])
+        for term in terms[1:]:
+            if not hits:
+                break
+            hits = hits & self._with_prefix(term)[1]
+        if not hits:
+            return [self.items[i] for i in self._fuzzy("".join(terms), limit)]
+
+        query = " ".join(terms)
+        lo = bisect_left(self._names, query)
+        hi = bisect_left(self._names, query + "\uffff")
+        ordered = []
+        for i in range(lo, hi):
+            if i in hits:
+                ordered.append(i)
+                if len(ordered) == limit:
+                    return [self.items[i] for i in ordered]
+        for group in (hits & in_name, hits - in_name):
+            rest = [i for i in group if not lo <= i < hi]
+            want = limit - len(ordered) if limit else None
+            ordered += heapq.nsmallest(want, rest) if want else sorted(rest)
+            if limit and len(ordered) >= limit:
+                break
+        return [self.items[i] for i in ordered]
@@ -0,0 +1,190 @@
+"""Bulk menu import/export with a diff-based upsert.
+
+    python -m utils.menu_sync export data/menu_export.csv
+    python -m utils.menu_sync import data/menu.csv --dry-run
+    python -m utils.menu_sync import menu.json --db outlet1.db --db outlet2.db --delete-missing
+
+An import reads the whole file, compares it with the menu table in memory
+and then writes only what differs: inserts, updates, deletes and
+availability flips. Each database gets all of its changes in one
+transaction. Rows in the file are matched to the table by ``id`` when the
+file has one, and otherwise by name.
+"""
+import argparse
+import csv
+import json
+import os
+
+from utils import db_pool
+from utils import repository
+from utils.migrations import migrate
+
+FIELDS = ("id", "name", "category", "price", "gst_percent", "available_today")
+
+
+class MenuDiff:
+    """What a sync changes: new rows, edited rows, removed ids and availability flips."""
+
+    def __init__(self):
+        self.inserts = []       # (name, category, price, gst_percent, available_today)
+        self.updates = []       # (id, name, category, price, gst_percent, available_today)
+        self.deletes = []       # ids
+        self.flips = []         # (id, available_today) where nothing else changed
+        self.unchanged = 0
+
+    def __bool__(self):
+        return bool(self.inserts or self.updates or self.deletes or self.flips)
+
+    def counts(self):
+        return {'inserted': len(self.inserts), 'updated': len(self.updates), 'deleted': len(self.deletes),
+                'availability': len(self.flips), 'unchanged': self.unchanged}
+
+    def report(self):
+        lines = [", ".join(f"{k} {v}" for k, v in self.counts().items())]
+        lines += [f"  + {name} ({category}) ₹{price}" for name, category, price, _, _ in self.inserts]
+        lines += [f"  ~ #{item_id} {name} ({category}) ₹{price}" for item_id, name, category, price, _, _ in self.updates]
+        lines += [f"  - #{item_id}" for item_id in self.deletes]
+        lines += [f"  {'✓' if avail else '✗'} #{item_id}" for item_id, avail in self.flips]
+        return "\n".join(lines)
+
+
+def _number(value, default=None):
+    if value is None or str(value).strip() == "":
+        return default
+    return float(value)
+
+
+def normalise(row):
+    """A file row (dict) as a plain menu dict; raises ValueError if it is unusable.
+
+    available_today is None when the file has no such column or the cell
+    is blank: the sync then leaves the item's availability as it is.
+    """
+    available = _number(row.get('available_today'))
+    name = str(row.get('name') or "").strip()
+    if not name:
+        raise ValueError(f"menu row without a name: {row!r}")
+    item_id = row.get('id')
+    return {
+        'id': int(item_id) if item_id not in (None, "") else None,
+        'name': name,
+        'category': str(row.get('category') or "").strip(),
+        'price': round(_number(row.get('price'), 0.0), 2),
+        'gst_percent': _number(row.get('gst_percent')),
+        'available_today': None if available is None else (1 if int(available) else 0),
+    }
+
+
+def load_menu_file(path):
+    """Menu rows from a .json (list of objects) or .csv file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith(".json"):
+            rows = json.load(f)
+        else:
+            rows = list(csv.DictReader(f))
+    return [normalise(row) for row in rows]
+
+
+def diff_menu(current, incoming, delete_missing=False):
+    """Compare the current MenuItems with incoming menu dicts."""
+    diff = MenuDiff()
+    by_id = {it.id: it for it in current}
+    by_name = {}
+    for it in current:
+        by_name.setdefault(it.name, it)
+    seen = set()
+    for row in incoming:
+        old = by_id.get(row['id']) if row['id'] is not None else by_name.get(row['name'])
+        if old is None or old.id in seen:
+            diff.inserts.append((row['name'], row['category'], row['price'], row['gst_percent'],
+                                 row['available_today'] or 0))
+            continue
+        seen.add(old.id)
+        same = (old.name == row['name'] and old.category == row['category']
+                and round(old.price, 2) == row['price'] and old.gst_percent == row['gst_percent'])
+        keep = row['available_today'] is None
+        if not same:
+            diff.updates.append((old.id, row['name'], row['category'], row['price'], row['gst_percent'],
+                                 old.available_today if keep else row['available_today']))
+        elif not keep and (old.available_today == 1) != (row['available_today'] == 1):
+            diff.flips.append((old.id, row['available_today']))
+        else:
+            diff.unchanged += 1
+    if delete_missing:
+        diff.deletes = sorted(item_id for item_id in by_id if item_id not in seen)
+    return diff
+
+
+def apply_diff(diff, conn=None):
+    """Write a MenuDiff in a single transaction."""
+    conn = conn or db_pool.get_connection()
+    if not diff:
+        return diff
+
+    def run():
+        with db_pool.immediate(conn):
+            conn.executemany(repository.SQL['menu_add'], diff.inserts)
+            conn.executemany(repository.SQL['menu_update'],
+                             [(name, cat, price, gst, avail, item_id)
+                              for item_id, name, cat, price, gst, avail in diff.updates])
+            conn.executemany(repository.SQL['menu_delete'], [(item_id,) for item_id in diff.deletes])
+            conn.executemany(repository.SQL['menu_available_set'],
+                             [(avail, item_id) for item_id, avail in diff.flips])
+    db_pool.retry_busy(run)
+    repository.notify_menu_change()
+    return diff
+
+
+def sync_menu(rows, conn=None, delete_missing=False, dry_run=False):
+    """Make the menu table match `rows` (menu dicts); returns the MenuDiff."""
+    conn = conn or db_pool.get_connection()
+    diff = diff_menu(repository.list_menu(conn=conn), rows, delete_missing)
+    return diff if dry_run else apply_diff(diff, conn)
+
+
+def sync_outlets(rows, db_paths, delete_missing=False, dry_run=False):
+    """Sync the same menu into several outlet databases; {path: MenuDiff}."""
+    results = {}
+    for path in db_paths:
+        migrate(path)
+        results[path] = sync_menu(rows, db_pool.get_connection(path), delete_missing, dry_run)
+    return results
+
+
+def export_menu(path, conn=None):
+    """Write the menu table to .json or .csv; returns the number of rows."""
+    items = repository.list_menu(conn=conn)
+    with open(path, "w", newline='', encoding='utf-8') as out:
+        if path.lower().endswith(".json"):
+            json.dump([{f: it[f] for f in FIELDS} for it in items], out, indent=2, ensure_ascii=False)
+        else:
+            writer = csv.writer(out)
+            writer.writerow(FIELDS)
+            writer.writerows([it[f] for f in FIELDS] for it in items)
+    return len(items)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import or export the menu")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("path", help=".csv or .json file")
+    parser.add_argument("--db", action="append", help="outlet database (repeatable; default: RESTAURANT_DB)")
+    parser.add_argument("--delete-missing", action="store_true", help="delete menu rows not in the file")
+    parser.add_argument("--dry-run", action="store_true", help="report the diff without writing")
+    args = parser.parse_args(argv)
+    db_paths = args.db or [db_pool.DB_PATH]
+
+    if args.action == "export":
+        migrate(db_paths[0])
+        count = export_menu(args.path, db_pool.get_connection(db_paths[0]))
+        print(f"{count} menu items written to {args.path}")
+        return
+    if not os.path.exists(args.path):
+        parser.error(f"{args.path} not found")
+    rows = load_menu_file(args.path)
+    for path, diff in sync_outlets(rows, db_paths, args.delete_missing, args.dry_run).items():
+        print(f"{path}{' (dry run)' if args.dry_run else ''}: {diff.report()}")
+
+
+if __name__ == "__main__":
+    main()
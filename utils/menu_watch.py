@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+
+from utils import db_pool
+from utils.menu_cache import menu_cache
+
+# Every menu write, from any terminal, appends the item id here (by trigger),
+# so other terminals can see what changed without re-reading the menu.
+MENU_CHANGES_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS menu_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_id INTEGER NOT NULL,
+        changed_at TEXT NOT NULL DEFAULT (datetime('now'))
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_menu_changes_insert AFTER INSERT ON menu
+    BEGIN
+        INSERT INTO menu_changes (item_id) VALUES (NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_menu_changes_update AFTER UPDATE ON menu
+    BEGIN
+        INSERT INTO menu_changes (item_id) VALUES (NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_menu_changes_delete AFTER DELETE ON menu
+    BEGIN
+        INSERT INTO menu_changes (item_id) VALUES (OLD.id);
+    END
+    """,
+)
+
+KEEP_DAYS = 2               # change-log rows older than this are pruned
+FULL_RELOAD_AFTER = 500     # more changed ids than this in one poll reloads the whole menu
+
+
+def setup_menu_changes(cursor):
+    for stmt in MENU_CHANGES_DDL:
+        cursor.execute(stmt)
+
+
+class MenuChangeWatcher:
+    """Invalidates a MenuCache when any terminal changes the menu.
+
+    ``poll()`` is cheap enough to call every second or so. It checks
+    PRAGMA data_version, which only moves when another connection commits,
+    before it reads the change log. Use ``start()`` for a background thread
+    in servers; Tk code should call ``poll()`` from ``after()`` instead.
+    """
+
+    def __init__(self, cache=None, db_path=None):
+        self.cache = cache or menu_cache
+        self.db_path = db_path
+        self._data_version = None
+        self._stop = threading.Event()
+        conn = db_pool.get_connection(db_path)
+        try:
+            db_pool.retry_busy(self._prune, conn)
+        except sqlite3.OperationalError as e:
+            if not db_pool.is_busy_error(e):
+                raise       # pruning is housekeeping; a busy database just skips it this time
+        self.last_seq = conn.execute("SELECT IFNULL(MAX(seq), 0) FROM menu_changes").fetchone()[0]
+
+    @staticmethod
+    def _prune(conn):
+        with db_pool.immediate(conn):
+            conn.execute("DELETE FROM menu_changes WHERE changed_at < datetime('now', ?)", (f"-{KEEP_DAYS} days",))
+
+    def poll(self):
+        """Invalidate items changed since the last poll; returns their ids."""
+        conn = db_pool.get_connection(self.db_path)
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return []
+        self._data_version = version
+        rows = conn.execute("SELECT seq, item_id FROM menu_changes WHERE seq > ? ORDER BY seq",
+                            (self.last_seq,)).fetchall()
+        if not rows:
+            return []
+        self.last_seq = rows[-1][0]
+        changed = sorted({item_id for _, item_id in rows})
+        if len(changed) > FULL_RELOAD_AFTER:
+            self.cache.invalidate()
+        else:
+            for item_id in changed:
+                self.cache.invalidate(item_id)
+        return changed
+
+    def start(self, interval=1.0):
+        """Poll on a daemon thread until stop()."""
+        def run():
+            while not self._stop.wait(interval):
+                self.poll()
+        threading.Thread(target=run, name="menu-watch", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,275 @@
+import atexit
+import collections
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from utils import db_pool
+
+METRICS_FILE = os.environ.get("BILLING_METRICS_FILE")
+PROFILE_DIR = os.environ.get("BILLING_PROFILE_DIR", "profiles")
+SQL_CAPTURE = os.environ.get("BILLING_METRICS_SQL") == "1"    # trace SQL text outside of profiles too
+SAMPLE_WINDOW = 2048
+SQL_PER_OP = 20
+
+
+class OpStats:
+    """Counters and a latency window for one instrumented operation."""
+
+    __slots__ = ("count", "errors", "total_time", "max_time", "rows_read",
+                 "rows_written", "samples", "sql")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows_read = 0
+        self.rows_written = 0
+        self.samples = collections.deque(maxlen=SAMPLE_WINDOW)
+        self.sql = collections.OrderedDict()   # statement -> times seen
+
+    def percentile(self, ordered, pct):
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def as_dict(self):
+        ordered = sorted(self.samples)
+        ms = lambda s: round(s * 1000, 4)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean_ms': ms(self.total_time / self.count) if self.count else 0.0,
+            'p50_ms': ms(self.percentile(ordered, 50)),
+            'p95_ms': ms(self.percentile(ordered, 95)),
+            'p99_ms': ms(self.percentile(ordered, 99)),
+            'max_ms': ms(self.max_time),
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'sql': dict(self.sql),
+        }
+
+
+class MetricsRegistry:
+    """In-process registry of OpStats, keyed by operation name."""
+
+    def __init__(self):
+        self.enabled = os.environ.get("BILLING_METRICS", "1") != "0"
+        self._ops = {}
+        self._lock = threading.Lock()
+
+    def stats(self, name):
+        op = self._ops.get(name)
+        if op is None:
+            with self._lock:
+                op = self._ops.setdefault(name, OpStats())
+        return op
+
+    def record(self, name, elapsed, rows_read=0, rows_written=0, sql=(), error=False):
+        op = self.stats(name)
+        with self._lock:
+            op.count += 1
+            op.errors += 1 if error else 0
+            op.total_time += elapsed
+            op.max_time = max(op.max_time, elapsed)
+            op.rows_read += rows_read
+            op.rows_written += rows_written
+            op.samples.append(elapsed)
+            for stmt in sql:
+                op.sql[stmt] = op.sql.pop(stmt, 0) + 1
+                if len(op.sql) > SQL_PER_OP:
+                    op.sql.popitem(last=False)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: op.as_dict() for name, op in sorted(self._ops.items())}
+
+    def reset(self):
+        with self._lock:
+            self._ops.clear()
+
+    def dump(self, path=None):
+        """Write the snapshot as JSON; returns the path written."""
+        path = path or METRICS_FILE or f"metrics_{datetime.now():%Y%m%d_%H%M%S}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({'dumped_at': datetime.now().isoformat(timespec="seconds"),
+                       'operations': self.snapshot()}, f, indent=2)
+        return path
+
+    def report(self):
+        lines = [f"{'operation':48s} {'count':>7s} {'p50ms':>9s} {'p95ms':>9s} {'p99ms':>9s} {'rows':>8s}"]
+        for name, s in self.snapshot().items():
+            lines.append(f"{name:48s} {s['count']:7d} {s['p50_ms']:9.3f} {s['p95_ms']:9.3f} "
+                         f"{s['p99_ms']:9.3f} {s['rows_read'] + s['rows_written']:8d}")
+        return "\n".join(lines)
+
+
+registry = MetricsRegistry()
+
+# ---------------------- SQL CAPTURE ----------------------
+
+_active = threading.local()   # stack of SQL lists for the instrumented calls in flight
+# The trace callback sees statements with values bound in; strip them back
+# out so the registry keeps one entry per query shape and no customer data.
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def _trace_sql(statement):
+    stack = getattr(_active, "stack", None)
+    if stack:
+        stack[-1].append(_LITERALS.sub("?", " ".join(statement.split())))
+
+
+_capturing = 0       # SQL_CAPTURE plus the profiles in progress; the trace is on while > 0
+_capture_lock = threading.Lock()
+
+
+def _install_trace(conn):
+    if _capturing:
+        conn.set_trace_callback(_trace_sql)
+
+
+def capture_sql(on=True):
+    """Turn SQL text capture on or off (nested: each on needs an off).
+
+    The trace callback costs time on every statement, so connections only
+    carry it while capture is on.
+    """
+    global _capturing
+    with _capture_lock:
+        was = _capturing
+        _capturing = max(0, _capturing + (1 if on else -1))
+        now = _capturing
+    if bool(was) != bool(now):
+        for conn in db_pool.pooled_connections():
+            conn.set_trace_callback(_trace_sql if now else None)
+
+
+db_pool.on_connect.append(_install_trace)
+if SQL_CAPTURE:
+    capture_sql()
+
+# ---------------------- DECORATOR ----------------------
+
+
+def instrument(name=None, db=True):
+    """Record latency, rows touched and SQL text for every call of a function.
+
+    Rows written come from total_changes of the connection the call used:
+    its ``conn`` argument, or else this thread's pooled connection (to the
+    ``db_path`` argument, or the default database) if the call had or opened
+    one. Rows read are counted when the function returns a list of rows.
+    SQL text is kept only while capture_sql() is on. Pass db=False for
+    functions that never touch the database.
+    """
+    def decorate(fn):
+        op_name = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return fn(*args, **kwargs)
+            conn = _call_connection(args, kwargs) if db else None
+            pooled = db and conn is None
+            if pooled:
+                conn = db_pool.peek_connection(kwargs.get('db_path'))
+            changes = conn.total_changes if conn is not None else 0
+            stack = getattr(_active, "stack", None)
+            if stack is None:
+                stack = _active.stack = []
+            stack.append([])
+            error = False
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            except Exception:
+                error = True
+                result = None
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                sql = stack.pop()
+                if stack:
+                    stack[-1].extend(sql)
+                if pooled and conn is None:
+                    conn = db_pool.peek_connection(kwargs.get('db_path'))    # opened by the call: counts from 0
+                registry.record(op_name, elapsed,
+                                rows_read=len(result) if isinstance(result, list) else 0,
+                                rows_written=conn.total_changes - changes if conn is not None else 0,
+                                sql=sql, error=error)
+        return wrapper
+    return decorate
+
+
+def _call_connection(args, kwargs):
+    conn = kwargs.get('conn')
+    if conn is None:
+        conn = next((arg for arg in args if isinstance(arg, sqlite3.Connection)), None)
+    return conn
+
+# ---------------------- PROFILING ----------------------
+
+_profile_next = threading.Event()
+if os.environ.get("BILLING_PROFILE_CHECKOUT") == "1":
+    _profile_next.set()
+
+
+def profile_next_checkout():
+    """Arm a one-shot cProfile + tracemalloc capture of the next checkout."""
+    _profile_next.set()
+
+
+@contextmanager
+def capture_profile(label="checkout", out_dir=None, force=False):
+    """Profile the enclosed block if armed (or forced); yields the report path or None.
+
+    Writes <label>_<timestamp>.prof (load with pstats or snakeviz) and a .txt
+    summary with the top functions by cumulative time and top allocations.
+    SQL text capture (see capture_sql) is on while the block runs.
+    """
+    if not (force or _profile_next.is_set()):
+        yield None
+        return
+    import cProfile
+    import io
+    import pstats
+    import tracemalloc
+
+    _profile_next.clear()
+    out_dir = out_dir or PROFILE_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"{label}_{datetime.now():%Y%m%d_%H%M%S}")
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(25)
+    capture_sql()       # per-operation SQL text in the metrics while profiling
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield base + ".txt"
+    finally:
+        profiler.disable()
+        capture_sql(False)
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+        profiler.dump_stats(base + ".prof")
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+        out.write("\nTop allocations:\n")
+        for stat in snapshot.statistics("lineno")[:20]:
+            out.write(f"{stat}\n")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+
+
+if METRICS_FILE:
+    atexit.register(registry.dump)
@@ -0,0 +1,141 @@
+import csv
+import os
+import threading
+
+from utils import db_pool
+from utils.analytics import setup_analytics
+from utils.archive import setup_archive_catalog
+from utils.auth import hash_password, hash_stored_passwords
+from utils.menu_watch import setup_menu_changes
+from utils.order_journal import setup_journal_ids
+from utils.repository import setup_indexes
+from utils.sales_rollup import setup_sales_rollup
+from utils.tabs import setup_open_tabs, setup_tab_journal_ids
+
+MENU_CSV = "data/menu.csv"
+
+
+def _base_schema(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS staff (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS menu (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        category TEXT,
+        price REAL NOT NULL,
+        gst_percent REAL,
+        available_today INTEGER DEFAULT 0
+    )
+    """)
+    # databases created by older builds may lack the flag
+    cursor.execute("PRAGMA table_info(menu)")
+    if "available_today" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE menu ADD COLUMN available_today INTEGER DEFAULT 0")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_type TEXT,
+        payment_method TEXT,
+        total_amount REAL,
+        gst_amount REAL,
+        discount REAL,
+        created_at TEXT
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER,
+        item_id INTEGER,
+        quantity INTEGER,
+        FOREIGN KEY(order_id) REFERENCES orders(id),
+        FOREIGN KEY(item_id) REFERENCES menu(id)
+    )
+    """)
+    cursor.execute("SELECT COUNT(*) FROM staff")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("INSERT INTO staff (username, password) VALUES (?, ?)", ("admin", hash_password("admin123")))
+    seed_menu_from_csv(cursor)
+
+
+def seed_menu_from_csv(cursor, path=MENU_CSV):
+    """Load the menu CSV if the menu table is empty.
+
+    Items start unavailable (staff pick today's menu) unless the CSV has an
+    available_today column.
+    """
+    cursor.execute("SELECT COUNT(*) FROM menu")
+    if cursor.fetchone()[0] or not os.path.exists(path):
+        return
+    rows = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                rows.append((row['name'].strip(), row.get('category', '').strip(),
+                             float(row.get('price', 0)), float(row.get('gst_percent', 0)),
+                             int(row.get('available_today') or 0)))
+            except Exception:
+                continue
+    cursor.executemany(
+        "INSERT INTO menu (name, category, price, gst_percent, available_today) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+
+
+# Append only: a database at user_version N has had MIGRATIONS[:N] applied.
+# Every step must also be safe on databases created before versioning existed.
+MIGRATIONS = (
+    _base_schema,
+    setup_sales_rollup,
+    setup_analytics,
+    setup_indexes,
+    hash_stored_passwords,
+    setup_menu_changes,
+    setup_archive_catalog,
+    setup_journal_ids,
+    setup_open_tabs,
+    setup_tab_journal_ids,
+)
+
+_done = set()
+_lock = threading.Lock()
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path=None):
+    """Bring the database up to the latest schema; returns the steps applied.
+
+    Each pending step runs in its own transaction together with the
+    user_version bump. Once a database is current, later calls in the same
+    process return immediately without touching it.
+    """
+    path = db_path or db_pool.DB_PATH
+    if path in _done:
+        return []
+    with _lock:
+        if path in _done:
+            return []
+        conn = db_pool.get_connection(path)
+        applied = []
+        version = schema_version(conn)
+        for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+            with conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                # another process may have migrated while we waited for the lock
+                if schema_version(conn) >= number:
+                    continue
+                step(cursor)
+                cursor.execute(f"PRAGMA user_version = {number}")
+            applied.append(step.__name__)
+        _done.add(path)
+        return applied
@@ -0,0 +1,128 @@
+from utils.calculator import GstSlabs
+
+
+class OrderLine:
+    __slots__ = ("id", "name", "category", "price", "gst_percent", "quantity")
+
+    def __init__(self, id, name, category, price, gst_percent, quantity):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.price = price
+        self.gst_percent = gst_percent
+        self.quantity = quantity
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    @property
+    def amount(self):
+        return self.price * self.quantity
+
+    def as_dict(self):
+        return {'id': self.id, 'name': self.name, 'category': self.category, 'price': self.price,
+                'gst_percent': self.gst_percent, 'quantity': self.quantity}
+
+
+class OpenOrder:
+    """The order being rung up, with totals kept current as it changes.
+
+    Adding an item that is already on the order bumps that line's quantity
+    instead of adding a row. Every change is reported to listeners as
+    ``listener(event, index, line)`` where event is "insert", "update" or
+    "delete" and index is the row position, or ``listener("clear", None,
+    None)``, so a view only has to touch the affected row.
+    """
+
+    def __init__(self, default_gst_percent=5.0):
+        self._lines = {}          # item id -> OrderLine, in display order
+        self._slabs = GstSlabs(default_gst_percent)
+        self._listeners = []
+
+    @property
+    def default_gst_percent(self):
+        return self._slabs.default_gst_percent
+
+    @default_gst_percent.setter
+    def default_gst_percent(self, value):
+        if value == self._slabs.default_gst_percent:
+            return
+        self._slabs.default_gst_percent = value
+        # lines without their own rate follow the default, as they do in calculate_bill
+        for line in self._lines.values():
+            if line.gst_percent is None:
+                self._slabs.set_line(line.id, line)
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def _emit(self, event, index, line):
+        for listener in self._listeners:
+            listener(event, index, line)
+
+    def _index(self, item_id):
+        for i, key in enumerate(self._lines):
+            if key == item_id:
+                return i
+        return -1
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __bool__(self):
+        return bool(self._lines)
+
+    def __iter__(self):
+        return iter(self._lines.values())
+
+    def lines(self):
+        return list(self._lines.values())
+
+    def items(self):
+        """Plain item dicts in the shape calculate_bill / save_order expect."""
+        return [line.as_dict() for line in self._lines.values()]
+
+    def add(self, item, quantity=1):
+        """Add quantity of a menu item, merging with an existing line."""
+        line = self._lines.get(item['id'])
+        if line is not None:
+            return self.set_quantity(item['id'], line.quantity + quantity)
+        line = OrderLine(item['id'], item['name'], item.get('category'), item['price'],
+                         item.get('gst_percent'), quantity)
+        self._lines[line.id] = line
+        self._slabs.set_line(line.id, line)
+        self._emit("insert", len(self._lines) - 1, line)
+        return line
+
+    def set_quantity(self, item_id, quantity):
+        if quantity <= 0:
+            return self.remove(item_id)
+        line = self._lines[item_id]
+        line.quantity = quantity
+        self._slabs.set_line(item_id, line)
+        self._emit("update", self._index(item_id), line)
+        return line
+
+    def remove(self, item_id):
+        index = self._index(item_id)
+        if index < 0:
+            return None
+        line = self._lines.pop(item_id)
+        self._slabs.remove_line(item_id)
+        self._emit("delete", index, line)
+        return line
+
+    def clear(self):
+        self._lines.clear()
+        self._slabs.clear()
+        self._emit("clear", None, None)
+
+    def totals(self, discount_percent=0.0):
+        """Bill for the current lines; same result as calculate_bill(self.items())."""
+        return self._slabs.summary(discount_percent)
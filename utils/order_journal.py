@@ -0,0 +1,299 @@
+"""Append-only local journal that every till order is written to first.
+
+    python -m utils.order_journal status
+    python -m utils.order_journal replay            # store everything still pending, then exit
+
+With the journal enabled (order_writer.enable_journal()), a checkout only
+pays for one sequential append and fsync to a file on the till's own disk.
+A background replayer then writes journal records into SQLite in
+batches. If the database is locked, the disk holding it is full or its
+network share has dropped, orders wait in the journal and are stored once
+the database is reachable again, including after a crash or restart.
+
+Each record is ``<length:u32><crc32:u32><JSON order>``. A record cut short
+by a crash, or with a bad CRC, ends the journal; the torn tail is removed
+the next time the journal is opened. Every order carries a ``journal_id``
+that the orders table stores under a unique index, so replaying the same
+record twice stores it once. After everything in the file is stored, the
+file is truncated.
+
+One journal file belongs to one process (it is locked while open); give
+every till its own BILLING_ORDER_JOURNAL path.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import struct
+import threading
+import uuid
+import zlib
+from concurrent.futures import Future, TimeoutError
+
+from utils import db_pool
+from utils.metrics import instrument
+from utils.order_writer import write_orders
+
+try:
+    import fcntl
+except ImportError:     # Windows: no advisory lock
+    fcntl = None
+
+JOURNAL_PATH = os.environ.get("BILLING_ORDER_JOURNAL", os.path.join("db", "orders.journal"))
+JOURNAL_WAIT = float(os.environ.get("BILLING_JOURNAL_WAIT", "0.5"))    # seconds checkout waits for the order id
+MAX_BATCH = 200
+RETRY_MIN, RETRY_MAX = 0.5, 10.0
+
+HEADER = struct.Struct("<II")
+
+JOURNAL_ID_DDL = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_journal_id ON orders(journal_id) WHERE journal_id IS NOT NULL",
+)
+
+
+def setup_journal_ids(cursor):
+    """Migration step: orders.journal_id, unique so a replayed record is stored once."""
+    cursor.execute("PRAGMA table_info(orders)")
+    if "journal_id" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE orders ADD COLUMN journal_id TEXT")
+    for stmt in JOURNAL_ID_DDL:
+        cursor.execute(stmt)
+
+
+def encode_record(order):
+    payload = json.dumps(order, separators=(",", ":")).encode("utf-8")
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_records(f, offset=0):
+    """Yield (end_offset, order) for each whole, intact record from offset on."""
+    f.seek(offset)
+    while True:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        length, crc = HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        offset += HEADER.size + length
+        yield offset, json.loads(payload)
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:         # not possible on Windows; the file fsync is enough there
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class OrderJournal:
+    """The journal file plus the background thread that replays it into SQLite."""
+
+    def __init__(self, path=None, db_path=None, wait=None, start=True):
+        self.path = path or JOURNAL_PATH
+        self.db_path = db_path
+        self.wait = JOURNAL_WAIT if wait is None else wait
+        self._lock = threading.Lock()           # appends and truncation
+        self._read_lock = threading.Lock()      # the shared reader's file position
+        self._wake = threading.Event()
+        self._closed = False
+        self._futures = {}          # journal_id -> Future(order id)
+        self._offset = 0            # everything before this is stored
+        self.last_error = None
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        created = not os.path.exists(self.path)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(self._fd)
+                raise RuntimeError(f"order journal {self.path} is in use by another process")
+        if created:
+            _fsync_dir(self.path)
+        self._reader = open(self.path, "rb")
+        self._drop_torn_tail()
+        self._thread = None
+        if start:
+            self._thread = threading.Thread(target=self._run, name="order-journal", daemon=True)
+            self._thread.start()
+
+    def _drop_torn_tail(self):
+        end = 0
+        for end, _ in read_records(self._reader):
+            pass
+        if end < os.fstat(self._fd).st_size:
+            os.ftruncate(self._fd, end)
+            os.fsync(self._fd)
+        self._end = end             # appends start here
+
+    # ---------------------- WRITING ----------------------
+
+    @instrument(db=False)
+    def append(self, order):
+        """Durably record an order; returns a Future for its database id."""
+        if self._closed:
+            raise RuntimeError("order journal is closed")
+        order = dict(order, journal_id=order.get('journal_id') or uuid.uuid4().hex)
+        record = encode_record(order)
+        future = self._futures[order['journal_id']] = Future()     # before the replayer can see the record
+        try:
+            with self._lock:
+                self._write_record(record)
+        except OSError:
+            del self._futures[order['journal_id']]
+            raise
+        self._wake.set()
+        return future
+
+    def _write_record(self, record):
+        # caller holds _lock. A record that is not wholly written is cut off again,
+        # so it can never strand the records appended after it.
+        if os.fstat(self._fd).st_size != self._end:
+            os.ftruncate(self._fd, self._end)     # left over from a failed append
+        try:
+            view = memoryview(record)
+            while view:
+                written = os.write(self._fd, view)
+                if not written:
+                    raise OSError("short write to order journal")
+                view = view[written:]
+            os.fsync(self._fd)
+        except OSError:
+            try:
+                os.ftruncate(self._fd, self._end)
+                os.fsync(self._fd)
+            except OSError:
+                pass    # retried before the next append, and on the next open
+            raise
+        self._end += len(record)
+
+    def save(self, order):
+        """Journal an order, then wait up to `wait` seconds for its database id.
+
+        Returns None if the database has not stored it by then; the order is
+        safe in the journal either way.
+        """
+        future = self.append(order)
+        try:
+            return future.result(self.wait)
+        except TimeoutError:
+            return None
+
+    # ---------------------- REPLAY ----------------------
+
+    def pending(self):
+        """Orders journalled but not yet stored."""
+        with self._read_lock:
+            return sum(1 for _ in read_records(self._reader, self._offset))
+
+    def pending_orders(self):
+        """The orders journalled but not yet stored."""
+        with self._read_lock:
+            return [order for _, order in read_records(self._reader, self._offset)]
+
+    def replay(self, conn=None):
+        """Store every complete record after the replay position; returns how many were read.
+
+        Raises the database error if a batch cannot be committed; the
+        records stay in the journal for the next attempt.
+        """
+        conn = conn or db_pool.get_connection(self.db_path)
+        done = 0
+        while True:
+            batch = []
+            with self._read_lock:
+                for end, order in read_records(self._reader, self._offset):
+                    batch.append((end, order))
+                    if len(batch) >= MAX_BATCH:
+                        break
+            if not batch:
+                break
+            results = write_orders([order for _, order in batch], conn)
+            for (_, order), result in zip(batch, results):
+                future = self._futures.pop(order['journal_id'], None)
+                if isinstance(result, Exception):
+                    self._reject(order, result)
+                    if future is not None:
+                        future.set_exception(result)
+                elif future is not None:
+                    future.set_result(result)
+            self._offset = batch[-1][0]
+            done += len(batch)
+        self._compact()
+        return done
+
+    def _reject(self, order, error):
+        # a record the database refuses (bad data, not contention) must not block the ones behind it
+        with open(self.path + ".rejected", "a", encoding="utf-8") as out:
+            out.write(json.dumps({'error': str(error), 'order': order}) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+    def _compact(self):
+        with self._read_lock, self._lock:
+            if self._offset and self._offset == self._end:
+                os.ftruncate(self._fd, 0)
+                os.fsync(self._fd)
+                self._offset = self._end = 0
+
+    def _run(self):
+        from utils.migrations import migrate
+
+        delay = RETRY_MIN
+        while not self._closed:
+            self._wake.wait(delay if self.last_error else 1.0)
+            self._wake.clear()
+            try:
+                migrate(self.db_path)
+                self.replay()
+                self.last_error = None
+                delay = RETRY_MIN
+            except (sqlite3.Error, OSError) as e:
+                # database locked, unreachable or full: keep the orders and try again later
+                self.last_error = e
+                delay = min(delay * 2, RETRY_MAX)
+
+    def close(self, replay=True):
+        """Stop the replayer; by default make one last attempt to store what is pending."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if replay:
+            try:
+                self.replay()
+            except (sqlite3.Error, OSError) as e:
+                self.last_error = e
+        self._reader.close()
+        os.close(self._fd)
+
+
+def main(argv=None):
+    from utils.migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Inspect or replay the till order journal")
+    parser.add_argument("action", choices=("status", "replay"))
+    parser.add_argument("--journal", default=JOURNAL_PATH)
+    args = parser.parse_args(argv)
+
+    journal = OrderJournal(args.journal, start=False)
+    try:
+        if args.action == "status":
+            print(f"{journal.pending()} orders waiting in {args.journal}")
+            return
+        migrate()
+        print(f"{journal.replay()} orders replayed from {args.journal}")
+    finally:
+        journal.close(replay=False)
+
+
+if __name__ == "__main__":
+    main()
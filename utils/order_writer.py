@@ -0,0 +1,222 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from utils import db_pool
+from utils.metrics import instrument
+
+INSERT_ORDER_SQL = """
+    INSERT INTO orders (order_type, payment_method, total_amount, gst_amount, discount, created_at, journal_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+JOURNALED_ORDER_SQL = "SELECT id FROM orders WHERE journal_id = ?"
+# the lines of the open tab an order closes (utils.tabs); newer lines belong to a reopened tab
+CLOSE_TAB_SQL = "DELETE FROM open_tab_lines WHERE tab = ? AND added_at <= ?"
+INSERT_ITEMS_SQL = """
+    INSERT INTO order_items (order_id, item_id, quantity, item_name, category, unit_price)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def build_order(order_type, payment_method, bill, items, created_at=None, tab=None):
+    """Bundle everything needed to store one order (closing open tab `tab`, if given)."""
+    order = {
+        'order_type': order_type,
+        'payment_method': payment_method,
+        'total_amount': bill['total'],
+        'gst_amount': bill['gst'],
+        'discount': bill['discount'],
+        'created_at': created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'items': [(it['id'], it['quantity'], it.get('name'), it.get('category'), it.get('price'))
+                  for it in items],
+    }
+    if tab is not None:
+        order['tab'] = tab
+        order['tab_closed_at'] = time.time()
+    return order
+
+
+def _insert_order(cursor, order):
+    journal_id = order.get('journal_id')
+    if journal_id is not None:
+        # replaying a journal record that was already stored
+        row = cursor.execute(JOURNALED_ORDER_SQL, (journal_id,)).fetchone()
+        if row is not None:
+            return row[0]
+    cursor.execute(INSERT_ORDER_SQL, (
+        order['order_type'], order['payment_method'], order['total_amount'],
+        order['gst_amount'], order['discount'], order['created_at'], journal_id,
+    ))
+    order_id = cursor.lastrowid
+    cursor.executemany(INSERT_ITEMS_SQL, [(order_id,) + tuple(item) for item in order['items']])
+    if order.get('tab') is not None:
+        cursor.execute(CLOSE_TAB_SQL, (order['tab'], order['tab_closed_at']))
+    return order_id
+
+
+def _write_one(conn, order):
+    with db_pool.immediate(conn):
+        return _insert_order(conn.cursor(), order)
+
+
+@instrument()
+def write_order(order, conn=None):
+    """Store an order and all of its items in a single short transaction.
+
+    The write lock is taken up front (BEGIN IMMEDIATE). If another till holds
+    it past the busy timeout, the transaction is retried with backoff.
+    """
+    return db_pool.retry_busy(_write_one, conn or db_pool.get_connection(), order)
+
+
+def _write_many(conn, orders):
+    results = []
+    with db_pool.immediate(conn):
+        cursor = conn.cursor()
+        for order in orders:
+            cursor.execute("SAVEPOINT order_write")
+            try:
+                results.append(_insert_order(cursor, order))
+                cursor.execute("RELEASE order_write")
+            except Exception as e:
+                cursor.execute("ROLLBACK TO order_write")
+                cursor.execute("RELEASE order_write")
+                if db_pool.is_busy_error(e):
+                    raise
+                results.append(e)
+    return results
+
+
+@instrument()
+def write_orders(orders, conn=None):
+    """Store several orders in one transaction (one commit).
+
+    Each order gets its own savepoint, so one bad order does not sink the
+    rest. Returns one entry per order: the new order id, or the exception
+    that order raised. If the commit itself fails, the error propagates and
+    nothing was stored. A locked database retries the whole batch.
+    """
+    return db_pool.retry_busy(_write_many, conn or db_pool.get_connection(), orders)
+
+
+# ---------------------- GROUP-COMMIT WRITE QUEUE ----------------------
+
+class OrderWriteQueue:
+    """Background writer that commits many orders per transaction.
+
+    Callers submit orders from any thread; a single writer thread drains the
+    queue and stores up to ``max_batch`` orders per commit (one fsync) via
+    write_orders().
+    ``save`` blocks until the order's batch is committed and returns its id.
+    """
+
+    def __init__(self, db_path=None, max_batch=64, max_wait=0.005):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="order-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, order):
+        if self._closed:
+            raise RuntimeError("order write queue is closed")
+        future = Future()
+        self._queue.put((order, future))
+        return future
+
+    def save(self, order, timeout=None):
+        return self.submit(order).result(timeout)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                entry = self._queue.get(timeout=self.max_wait)
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        conn = db_pool.get_connection(self.db_path)
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                results = write_orders([order for order, _ in batch], conn)
+            except Exception as e:
+                # the commit itself failed; nothing in this batch was stored
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+_write_queue = None
+_journal = None
+
+
+def enable_write_queue(**kwargs):
+    """Route save_order() through a shared group-commit queue (rush hour mode)."""
+    global _write_queue
+    if _write_queue is None:
+        _write_queue = OrderWriteQueue(**kwargs)
+    return _write_queue
+
+
+def disable_write_queue():
+    global _write_queue
+    if _write_queue is not None:
+        _write_queue.close()
+        _write_queue = None
+
+
+def enable_journal(**kwargs):
+    """Write every save_order() to the local order journal first (see utils.order_journal)."""
+    global _journal
+    if _journal is None:
+        from utils.order_journal import OrderJournal
+        _journal = OrderJournal(**kwargs)
+    return _journal
+
+
+def disable_journal():
+    global _journal
+    if _journal is not None:
+        _journal.close()
+        _journal = None
+
+
+def save_order(order_type, payment_method, bill, items, created_at=None, tab=None):
+    """Store an order with its items and return the new order id.
+
+    With the journal enabled the id is None if the database did not take
+    the order within the journal's wait; it is stored later from the journal.
+    """
+    order = build_order(order_type, payment_method, bill, items, created_at, tab)
+    if _journal is not None:
+        return _journal.save(order)
+    if _write_queue is not None:
+        return _write_queue.save(order)
+    return write_order(order)
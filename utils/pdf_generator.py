@@ -1,45 +1,115 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 from datetime import datetime
 import os
+import sys
+from utils.metrics import instrument
 
-def generate_pdf_bill(order_items, bill_summary, filename="final_bill.pdf"):
-    c = canvas.Canvas(filename, pagesize=A4)
-    width, height = A4
-    y = height - 50
+TEMPLATE = "bill_template"
+MARGIN_X = 50
+TOP = 50            # title baseline, from the top edge
+FIRST_ROW = 130     # first item row, from the top edge
+BOTTOM = 60         # rows stop above this; the footer sits below it
+ROW_HEIGHT = 20
 
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(200, y, "Restaurant Final Bill")
-    y -= 30
+def open_file(path):
+    """Open a file with the platform's default viewer without blocking."""
+    if hasattr(os, "startfile"):
+        os.startfile(path)  # Windows
+        return
+    import subprocess
+    if sys.platform == "darwin":
+        subprocess.Popen(["open", path])
+    else:
+        subprocess.Popen(["xdg-open", path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
-    c.setFont("Helvetica", 12)
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.drawString(50, y, f"Date: {now}")
-    y -= 30
+def _define_template(c, width, height):
+    """Draw the static parts of a bill page once, as a form XObject.
 
+    Each page then just references it with doForm, so a document of any
+    length stores the header and footer a single time.
+    """
+    c.beginForm(TEMPLATE)
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(200, height - TOP, "Restaurant Final Bill")
     c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, "Item")
+    y = height - FIRST_ROW + ROW_HEIGHT
+    c.drawString(MARGIN_X, y, "Item")
     c.drawString(250, y, "Qty")
     c.drawString(300, y, "Price")
-    y -= 20
+    c.line(MARGIN_X, y - 5, width - MARGIN_X, y - 5)
+    c.setFont("Helvetica", 9)
+    c.drawString(MARGIN_X, BOTTOM - 30, "Thank you! Prices include the GST shown.")
+    c.endForm()
+
+def _summary_lines(bill_summary):
+    """(font, size, x, text, line height) for the totals block."""
+    lines = [("Helvetica-Bold", 12, MARGIN_X, f"Subtotal: ₹{bill_summary['subtotal']:.2f}", 20),
+             ("Helvetica-Bold", 12, MARGIN_X, f"GST: ₹{bill_summary['gst']:.2f}", 20)]
+    for slab in bill_summary.get('gst_breakdown', []):
+        lines.append(("Helvetica", 10, 70, f"@{slab['gst_percent']:g}% on ₹{slab['taxable']:.2f}: ₹{slab['gst']:.2f}", 15))
+    lines.append(("Helvetica-Bold", 12, MARGIN_X, f"Discount: ₹{bill_summary['discount']:.2f}", 20))
+    lines.append(("Helvetica-Bold", 12, MARGIN_X, f"TOTAL: ₹{bill_summary['total']:.2f}", 20))
+    return lines
+
+def _draw_bill(c, width, height, order_items, bill_summary, order_id=None, printed_at=None):
+    """Draw one bill on as many pages as it needs, ending with the page closed."""
+    printed_at = printed_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    heading = f"Date: {printed_at}" + (f"    Bill #{order_id}" if order_id is not None else "")
+    page = 0
+
+    def start_page():
+        nonlocal page
+        if page:
+            c.showPage()
+        page += 1
+        c.doForm(TEMPLATE)
+        c.setFont("Helvetica", 12)
+        c.drawString(MARGIN_X, height - TOP - 30, heading)
+        c.setFont("Helvetica", 9)
+        c.drawRightString(width - MARGIN_X, BOTTOM - 30, f"Page {page}")
+        c.setFont("Helvetica", 12)
+        return height - FIRST_ROW
 
-    c.setFont("Helvetica", 12)
+    y = start_page()
     for item in order_items:
-        c.drawString(50, y, item['name'])
+        if y < BOTTOM:
+            y = start_page()
+        c.drawString(MARGIN_X, y, item['name'])
         c.drawString(250, y, str(item['quantity']))
-        total_price = item['price'] * item['quantity']
-        c.drawString(300, y, f"₹{total_price:.2f}")
-        y -= 20
+        c.drawString(300, y, f"₹{item['price'] * item['quantity']:.2f}")
+        y -= ROW_HEIGHT
 
-    y -= 20
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, f"Subtotal: ₹{bill_summary['subtotal']:.2f}")
-    y -= 20
-    c.drawString(50, y, f"GST: ₹{bill_summary['gst']:.2f}")
-    y -= 20
-    c.drawString(50, y, f"Discount: ₹{bill_summary['discount']:.2f}")
-    y -= 20
-    c.drawString(50, y, f"TOTAL: ₹{bill_summary['total']:.2f}")
+    lines = _summary_lines(bill_summary)
+    y -= ROW_HEIGHT
+    if y - sum(step for *_, step in lines) < BOTTOM:
+        y = start_page()        # keep the totals together
+    for font, size, x, text, step in lines:
+        c.setFont(font, size)
+        c.drawString(x, y, text)
+        y -= step
+    c.showPage()
+
+@instrument(db=False)
+def generate_pdf_batch(bills, filename):
+    """Render many bills into one PDF (reprints, audits); returns the filename.
+
+    Each bill is a dict with 'items' and 'bill' (the calculate_bill result),
+    optionally 'order_id' and 'created_at'. Every bill starts on a new page.
+    """
+    # ReportLab is only needed at checkout; importing it here keeps till start-up fast
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
 
+    c = canvas.Canvas(filename, pagesize=A4)
+    width, height = A4
+    _define_template(c, width, height)
+    for bill in bills:
+        _draw_bill(c, width, height, bill['items'], bill['bill'], bill.get('order_id'), bill.get('created_at'))
     c.save()
-    os.startfile(filename)  # Opens the PDF on Windows
+    return filename
+
+@instrument(db=False)
+def generate_pdf_bill(order_items, bill_summary, filename="final_bill.pdf", open_after=True, order_id=None):
+    generate_pdf_batch([{'items': order_items, 'bill': bill_summary, 'order_id': order_id}], filename)
+    if open_after:
+        open_file(filename)
+    return filename
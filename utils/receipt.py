@@ -0,0 +1,99 @@
+"""Plain-text and ESC/POS receipts for thermal printers.
+
+Uses no ReportLab and no fonts: a receipt is a few dozen short lines,
+which makes it far cheaper per bill than a PDF.
+"""
+import textwrap
+from datetime import datetime
+
+from utils.metrics import instrument
+
+RECEIPT_WIDTH = 42          # characters per line on an 80 mm printer (Font A); 32 for 58 mm
+TITLE = "Restaurant Final Bill"
+FOOTER = "Thank you! Prices include the GST shown."
+
+# ESC/POS commands
+ESC_INIT = b"\x1b@"
+ESC_ALIGN = {"left": b"\x1ba\x00", "center": b"\x1ba\x01"}
+ESC_BOLD = {True: b"\x1bE\x01", False: b"\x1bE\x00"}
+GS_SIZE = {"normal": b"\x1d!\x00", "double": b"\x1d!\x11"}
+ESC_FEED = b"\x1bd\x04"
+GS_CUT = b"\x1dVB\x00"      # feed to the cutter, then partial cut
+
+
+def _money(value):
+    return f"{value:.2f}"
+
+
+def _pair(label, value, width):
+    return f"{label}{value:>{width - len(label)}}"
+
+
+def receipt_lines(order_items, bill_summary, order_id=None, created_at=None, width=RECEIPT_WIDTH):
+    """[(style, text)] where style is "title", "center", "bold" or "normal"."""
+    created_at = created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rule = "-" * width
+    name_width = width - 16
+    lines = [("title", TITLE), ("center", created_at)]
+    if order_id is not None:
+        lines.append(("center", f"Bill #{order_id}"))
+    lines += [("normal", rule),
+              ("bold", f"{'Item':<{name_width}}{'Qty':>5}{'Amount':>11}"),
+              ("normal", rule)]
+    for item in order_items:
+        *head, name = textwrap.wrap(item['name'], name_width) or [""]   # wrap long names, don't cut them
+        lines += [("normal", part) for part in head]
+        lines.append(("normal", f"{name:<{name_width}}{item['quantity']:>5}"
+                                f"{_money(item['price'] * item['quantity']):>11}"))
+    lines.append(("normal", rule))
+    lines.append(("normal", _pair("Subtotal", _money(bill_summary['subtotal']), width)))
+    lines.append(("normal", _pair("GST", _money(bill_summary['gst']), width)))
+    for slab in bill_summary.get('gst_breakdown', []):
+        lines.append(("normal", _pair(f"  @{slab['gst_percent']:g}% on {_money(slab['taxable'])}",
+                                      _money(slab['gst']), width)))
+    lines.append(("normal", _pair("Discount", "-" + _money(bill_summary['discount']), width)))
+    lines.append(("bold", _pair("TOTAL Rs.", _money(bill_summary['total']), width)))
+    lines += [("normal", rule), ("center", FOOTER[:width])]
+    return lines
+
+
+@instrument(db=False)
+def format_receipt(order_items, bill_summary, order_id=None, created_at=None, width=RECEIPT_WIDTH):
+    """The receipt as plain text."""
+    out = []
+    for style, text in receipt_lines(order_items, bill_summary, order_id, created_at, width):
+        out.append(text.center(width).rstrip() if style in ("title", "center") else text)
+    return "\n".join(out) + "\n"
+
+
+@instrument(db=False)
+def escpos_receipt(order_items, bill_summary, order_id=None, created_at=None, width=RECEIPT_WIDTH,
+                   encoding="cp437", cut=True):
+    """The receipt as ESC/POS bytes, ready to send to the printer as-is."""
+    out = [ESC_INIT]
+    for style, text in receipt_lines(order_items, bill_summary, order_id, created_at, width):
+        data = text.encode(encoding, errors="replace")
+        if style == "title":
+            out += [ESC_ALIGN["center"], GS_SIZE["double"], data, b"\n", GS_SIZE["normal"], ESC_ALIGN["left"]]
+        elif style == "center":
+            out += [ESC_ALIGN["center"], data, b"\n", ESC_ALIGN["left"]]
+        elif style == "bold":
+            out += [ESC_BOLD[True], data, b"\n", ESC_BOLD[False]]
+        else:
+            out += [data, b"\n"]
+    out.append(ESC_FEED)
+    if cut:
+        out.append(GS_CUT)
+    return b"".join(out)
+
+
+def write_receipt(path, order_items, bill_summary, order_id=None, created_at=None, fmt="text",
+                  width=RECEIPT_WIDTH):
+    """Write a "text" or "escpos" receipt to a file (or printer device); returns the path."""
+    if fmt == "escpos":
+        with open(path, "wb") as out:
+            out.write(escpos_receipt(order_items, bill_summary, order_id, created_at, width))
+    else:
+        with open(path, "w", encoding="utf-8") as out:
+            out.write(format_receipt(order_items, bill_summary, order_id, created_at, width))
+    return path
@@ -0,0 +1,156 @@
+"""Streaming sales reports over orders / order_items / menu.
+
+    python -m utils.reports daily --from 2025-01-01 --to 2025-12-31 --out data/sales_report.csv
+    python -m utils.reports item --format json --out items.json
+
+Rows are aggregated in SQLite and pulled through cursors in chunks, then
+written out as they arrive, so memory use does not grow with history.
+Date ranges are half-open [from, to + 1 day) on created_at, which lets
+SQLite use the created_at index of the hot database and of every archive
+file the range reaches (see utils.archive.history).
+"""
+import argparse
+import csv
+import json
+import sys
+from datetime import date, timedelta
+
+from utils import archive, db_pool
+
+FETCH_SIZE = 1000
+
+# name -> (column headers, SQL). Every query gets the same date-range WHERE.
+# history_orders / history_lines are the hot tables plus any attached archives.
+REPORTS = {
+    'daily': (
+        ("date", "total_orders", "total_sales"),
+        """
+        SELECT substr(o.created_at, 1, 10) AS day, COUNT(*), ROUND(SUM(o.total_amount), 2)
+        FROM history_orders o
+        WHERE {where}
+        GROUP BY day ORDER BY day
+        """,
+    ),
+    'item': (
+        ("item_id", "name", "category", "quantity", "sales"),
+        """
+        SELECT oi.item_id, COALESCE(MAX(oi.item_name), m.name, 'Deleted item #' || oi.item_id),
+               COALESCE(MAX(oi.category), m.category, ''),
+               SUM(oi.quantity), ROUND(SUM(oi.quantity * COALESCE(oi.unit_price, m.price, 0)), 2)
+        FROM history_lines oi
+        LEFT JOIN menu m ON m.id = oi.item_id
+        WHERE {where}
+        GROUP BY oi.item_id ORDER BY SUM(oi.quantity) DESC, oi.item_id
+        """,
+    ),
+    'category': (
+        ("category", "quantity", "sales"),
+        """
+        SELECT COALESCE(oi.category, m.category, ''), SUM(oi.quantity),
+               ROUND(SUM(oi.quantity * COALESCE(oi.unit_price, m.price, 0)), 2)
+        FROM history_lines oi
+        LEFT JOIN menu m ON m.id = oi.item_id
+        WHERE {where}
+        GROUP BY 1 ORDER BY 3 DESC
+        """,
+    ),
+    'payment': (
+        ("payment_method", "total_orders", "total_sales"),
+        """
+        SELECT IFNULL(o.payment_method, ''), COUNT(*), ROUND(SUM(o.total_amount), 2)
+        FROM history_orders o
+        WHERE {where}
+        GROUP BY 1 ORDER BY 3 DESC
+        """,
+    ),
+    'order_type': (
+        ("order_type", "total_orders", "total_sales"),
+        """
+        SELECT IFNULL(o.order_type, ''), COUNT(*), ROUND(SUM(o.total_amount), 2)
+        FROM history_orders o
+        WHERE {where}
+        GROUP BY 1 ORDER BY 3 DESC
+        """,
+    ),
+}
+
+
+def date_range_clause(start=None, end=None):
+    """WHERE clause and params for an inclusive [start, end] day range."""
+    clauses, params = [], []
+    if start:
+        clauses.append("created_at >= ?")
+        params.append(str(start))
+    if end:
+        clauses.append("created_at < ?")
+        params.append(str(date.fromisoformat(str(end)) + timedelta(days=1)))
+    return " AND ".join(clauses) or "1", params
+
+
+def stream_report(name, start=None, end=None, conn=None):
+    """Yield the header tuple, then one tuple per result row."""
+    header, sql = REPORTS[name]
+    where, params = date_range_clause(start, end)
+    conn = conn or db_pool.get_connection()
+    last = str(date.fromisoformat(str(end)) + timedelta(days=1)) if end else None
+    with archive.history(conn, start, last):
+        cursor = conn.execute(sql.format(where=where), params)
+        try:
+            yield header
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()      # archives cannot be detached while a statement is open
+
+
+def write_csv(rows, out):
+    writer = csv.writer(out)
+    count = -1
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_json(rows, out):
+    """Write a JSON array of objects one row at a time."""
+    rows = iter(rows)
+    header = next(rows)
+    out.write("[")
+    count = 0
+    for row in rows:
+        out.write(",\n" if count else "\n")
+        out.write(json.dumps(dict(zip(header, row))))
+        count += 1
+    out.write("\n]\n" if count else "]\n")
+    return count
+
+
+def export(name, out_path=None, fmt="csv", start=None, end=None, conn=None):
+    """Export one report to a file (or stdout); returns the number of rows written."""
+    writer = write_json if fmt == "json" else write_csv
+    rows = stream_report(name, start, end, conn)
+    if out_path is None:
+        return writer(rows, sys.stdout)
+    with open(out_path, "w", newline='', encoding='utf-8') as out:
+        return writer(rows, out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export sales reports")
+    parser.add_argument("report", choices=sorted(REPORTS))
+    parser.add_argument("--from", dest="start", help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="last day, YYYY-MM-DD")
+    parser.add_argument("--format", choices=("csv", "json"), default="csv")
+    parser.add_argument("--out", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+    count = export(args.report, args.out, args.format, args.start, args.end)
+    if args.out:
+        print(f"{count} rows written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Single data-access layer for staff, menu, sales and order lookups.
+
+The UI, the billing service and the batch tools all read and write through
+these functions, so every query is written once. The SQL is kept in module
+constants and always executed with the same text. That way, each pooled
+connection's statement cache compiles a query once and reuses it.
+"""
+import sqlite3
+
+from utils import archive, db_pool
+from utils.metrics import instrument
+from utils.sales_rollup import get_sales_for_day
+
+MENU_COLUMNS = "id, name, category, price, gst_percent, available_today"
+
+# Every index the queries below, the reports, analytics and archives rely on.
+# Index DDL lives only here; the setup_indexes migration step applies it.
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id)",
+    "CREATE INDEX IF NOT EXISTS idx_order_items_item_id ON order_items(item_id)",
+    "CREATE INDEX IF NOT EXISTS idx_menu_available_today ON menu(available_today, category, name)",
+)
+
+SQL = {
+    'staff_password': "SELECT password FROM staff WHERE username = ?",
+    'add_staff': "INSERT INTO staff (username, password) VALUES (?, ?)",
+    'change_password': "UPDATE staff SET password = ? WHERE username = ?",
+    'menu_all': f"SELECT {MENU_COLUMNS} FROM menu ORDER BY id",
+    'menu_available': f"SELECT {MENU_COLUMNS} FROM menu WHERE available_today = 1 ORDER BY category, name",
+    'menu_add': "INSERT INTO menu (name, category, price, gst_percent, available_today) VALUES (?, ?, ?, ?, ?)",
+    'menu_update': "UPDATE menu SET name = ?, category = ?, price = ?, gst_percent = ?, available_today = ? "
+                   "WHERE id = ?",
+    'menu_delete': "DELETE FROM menu WHERE id = ?",
+    'menu_available_set': "UPDATE menu SET available_today = ? WHERE id = ?",
+    'order': "SELECT id, order_type, payment_method, total_amount, gst_amount, discount, created_at "
+             "FROM orders WHERE id = ?",
+    'orders_between': "SELECT id, order_type, payment_method, total_amount, gst_amount, discount, created_at "
+                      "FROM history_orders WHERE created_at >= ? AND created_at < ? ORDER BY created_at, id",
+    'order_lines': """
+        SELECT oi.item_id, COALESCE(oi.item_name, m.name, 'Deleted item #' || oi.item_id),
+               COALESCE(oi.category, m.category, ''), COALESCE(oi.unit_price, m.price, 0), oi.quantity
+        FROM order_items oi
+        LEFT JOIN menu m ON m.id = oi.item_id
+        WHERE oi.order_id = ?
+        ORDER BY oi.id
+    """,
+    # archived orders, through utils.archive.history()
+    'order_history': "SELECT id, order_type, payment_method, total_amount, gst_amount, discount, created_at "
+                     "FROM history_orders WHERE id = ?",
+    'order_lines_history': """
+        SELECT oi.item_id, COALESCE(oi.item_name, m.name, 'Deleted item #' || oi.item_id),
+               COALESCE(oi.category, m.category, ''), COALESCE(oi.unit_price, m.price, 0), oi.quantity
+        FROM history_lines oi
+        LEFT JOIN menu m ON m.id = oi.item_id
+        WHERE oi.order_id = ?
+        ORDER BY oi.line_id
+    """,
+    'tab_lines': "SELECT tab, item_id, name, category, price, gst_percent, quantity, added_at "
+                 "FROM open_tab_lines ORDER BY tab, added_at",
+    'tab_line_set': "INSERT INTO open_tab_lines (tab, item_id, name, category, price, gst_percent, quantity, added_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (tab, item_id) DO UPDATE SET quantity = excluded.quantity",
+    'tab_line_delete': "DELETE FROM open_tab_lines WHERE tab = ? AND item_id = ?",
+    'tab_clear': "DELETE FROM open_tab_lines WHERE tab = ?",
+}
+
+# Called with the changed item id (None = whole menu) after every menu write.
+on_menu_change = []
+
+
+def setup_indexes(cursor):
+    for stmt in INDEXES:
+        cursor.execute(stmt)
+
+
+# ---------------------- ROWS ----------------------
+
+class MenuItem:
+    """One menu row. Supports item['name'] access like the old dict rows."""
+
+    __slots__ = ("id", "name", "category", "price", "gst_percent", "available_today")
+
+    def __init__(self, id, name, category, price, gst_percent, available_today):
+        self.id = id
+        self.name = name
+        self.category = category or ""
+        self.price = price
+        self.gst_percent = gst_percent
+        self.available_today = available_today
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self):
+        return f"MenuItem({self.id}, {self.name!r}, {self.price})"
+
+
+class OrderItemRow:
+    """One line of a saved order, as it was sold."""
+
+    __slots__ = ("item_id", "name", "category", "price", "quantity")
+
+    def __init__(self, item_id, name, category, price, quantity):
+        self.item_id = item_id
+        self.name = name
+        self.category = category
+        self.price = price
+        self.quantity = quantity
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    @property
+    def amount(self):
+        return self.price * self.quantity
+
+
+class OrderRow:
+    """A saved order; ``items`` is filled only by get_order()."""
+
+    __slots__ = ("id", "order_type", "payment_method", "total_amount", "gst_amount", "discount",
+                 "created_at", "items")
+
+    def __init__(self, id, order_type, payment_method, total_amount, gst_amount, discount, created_at,
+                 items=None):
+        self.id = id
+        self.order_type = order_type
+        self.payment_method = payment_method
+        self.total_amount = total_amount
+        self.gst_amount = gst_amount
+        self.discount = discount
+        self.created_at = created_at
+        self.items = items
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"OrderRow({self.id}, {self.created_at!r}, {self.total_amount})"
+
+
+def _conn(conn):
+    return conn or db_pool.get_connection()
+
+
+def _write(conn, sql, params=(), many=False):
+    """Run one write in a short BEGIN IMMEDIATE transaction, retrying while locked."""
+    c = _conn(conn)
+
+    def run():
+        with db_pool.immediate(c):
+            return c.executemany(sql, params) if many else c.execute(sql, params)
+    return db_pool.retry_busy(run)
+
+
+def notify_menu_change(item_id=None):
+    for listener in on_menu_change:
+        listener(item_id)
+
+# ---------------------- STAFF ----------------------
+
+# Passwords arrive here already hashed; see utils.auth.
+
+@instrument()
+def staff_password(username, conn=None):
+    """The stored password hash for a username, or None."""
+    row = _conn(conn).execute(SQL['staff_password'], (username,)).fetchone()
+    return row[0] if row else None
+
+
+@instrument()
+def add_staff(username, password_hash, conn=None):
+    """Returns False if the username is taken."""
+    try:
+        _write(conn, SQL['add_staff'], (username, password_hash))
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+
+@instrument()
+def change_password(username, password_hash, conn=None):
+    return _write(conn, SQL['change_password'], (password_hash, username)).rowcount > 0
+
+# ---------------------- MENU ----------------------
+
+@instrument()
+def list_menu(available_only=False, conn=None):
+    """MenuItems by id, or only today's items by category and name."""
+    sql = SQL['menu_available'] if available_only else SQL['menu_all']
+    return [MenuItem(*row) for row in _conn(conn).execute(sql)]
+
+
+@instrument()
+def get_menu_items(ids, conn=None):
+    """MenuItems for the given ids (missing ids are skipped)."""
+    ids = sorted(ids)
+    if not ids:
+        return []
+    marks = ",".join("?" * len(ids))
+    sql = f"SELECT {MENU_COLUMNS} FROM menu WHERE id IN ({marks})"
+    return [MenuItem(*row) for row in _conn(conn).execute(sql, ids)]
+
+
+@instrument()
+def add_menu_item(name, category, price, gst_percent, available, conn=None):
+    item_id = _write(conn, SQL['menu_add'], (name, category, price, gst_percent,
+                                             1 if available else 0)).lastrowid
+    notify_menu_change(item_id)
+    return item_id
+
+
+@instrument()
+def update_menu_item(item_id, name, category, price, gst_percent, available, conn=None):
+    _write(conn, SQL['menu_update'], (name, category, price, gst_percent, 1 if available else 0, item_id))
+    notify_menu_change(item_id)
+
+
+@instrument()
+def delete_menu_item(item_id, conn=None):
+    _write(conn, SQL['menu_delete'], (item_id,))
+    notify_menu_change(item_id)
+
+
+@instrument()
+def set_available_today(item_id, available, conn=None):
+    _write(conn, SQL['menu_available_set'], (1 if available else 0, item_id))
+    notify_menu_change(item_id)
+
+
+@instrument()
+def set_availability(changes, conn=None):
+    """Apply {item_id: available} in one transaction; returns rows updated."""
+    if not changes:
+        return 0
+    _write(conn, SQL['menu_available_set'],
+           [(1 if available else 0, item_id) for item_id, available in changes.items()], many=True)
+    for item_id in changes:
+        notify_menu_change(item_id)
+    return len(changes)
+
+# ---------------------- SALES / ORDERS ----------------------
+
+@instrument()
+def daily_sales(day=None, conn=None):
+    """Total sales for a day (default: today) from the daily_sales rollup."""
+    return get_sales_for_day(_conn(conn).cursor(), day)
+
+
+@instrument()
+def get_order(order_id, conn=None):
+    """OrderRow with its lines, or None. Looks in the archives when the order is no longer hot."""
+    c = _conn(conn)
+    row = c.execute(SQL['order'], (order_id,)).fetchone()
+    if row is not None:
+        return OrderRow(*row, items=[OrderItemRow(*line) for line in c.execute(SQL['order_lines'], (order_id,))])
+    with archive.history(c, order_id=order_id):
+        row = c.execute(SQL['order_history'], (order_id,)).fetchone()
+        if row is None:
+            return None
+        lines = c.execute(SQL['order_lines_history'], (order_id,)).fetchall()
+    return OrderRow(*row, items=[OrderItemRow(*line) for line in lines])
+
+
+@instrument()
+def orders_between(start, end, conn=None):
+    """OrderRows (without lines) with start <= created_at < end, archived ones included."""
+    c = _conn(conn)
+    with archive.history(c, start, end):
+        rows = c.execute(SQL['orders_between'], (str(start), str(end))).fetchall()
+    return [OrderRow(*row) for row in rows]
+
+# ---------------------- OPEN TABS ----------------------
+
+@instrument()
+def open_tab_lines(conn=None):
+    """[(tab, item_id, name, category, price, gst_percent, quantity, added_at)] by tab, in the order added."""
+    return _conn(conn).execute(SQL['tab_lines']).fetchall()
+
+
+@instrument()
+def apply_tab_changes(changes, conn=None):
+    """Write [(sql key, params)] tab deltas, in order, in one transaction."""
+    c = _conn(conn)
+
+    def run():
+        with db_pool.immediate(c):
+            for key, params in changes:
+                c.execute(SQL[key], params)
+    db_pool.retry_busy(run)
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+# orders.created_at is stored as local "YYYY-MM-DD HH:MM:SS", so the first
+# ten characters are the trading day and plain string ranges hit
+# idx_orders_created_at (repository.INDEXES).
+SALES_ROLLUP_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS daily_sales (
+        sale_date TEXT PRIMARY KEY,
+        total_orders INTEGER NOT NULL DEFAULT 0,
+        total_sales REAL NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_orders_daily_sales
+    AFTER INSERT ON orders
+    BEGIN
+        INSERT INTO daily_sales (sale_date, total_orders, total_sales)
+        VALUES (substr(NEW.created_at, 1, 10), 1, IFNULL(NEW.total_amount, 0))
+        ON CONFLICT(sale_date) DO UPDATE SET
+            total_orders = total_orders + 1,
+            total_sales = total_sales + excluded.total_sales;
+    END
+    """,
+)
+
+
+def setup_sales_rollup(cursor):
+    """Create the daily_sales rollup and backfill it the first time."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='daily_sales'")
+    exists = cursor.fetchone() is not None
+    for stmt in SALES_ROLLUP_DDL:
+        cursor.execute(stmt)
+    if not exists:
+        cursor.execute("""
+            INSERT INTO daily_sales (sale_date, total_orders, total_sales)
+            SELECT substr(created_at, 1, 10), COUNT(*), IFNULL(SUM(total_amount), 0)
+            FROM orders
+            WHERE created_at IS NOT NULL
+            GROUP BY substr(created_at, 1, 10)
+        """)
+
+
+def today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+def get_sales_for_day(cursor, day=None):
+    """Total sales for a day (default: today, local time) from the rollup."""
+    cursor.execute("SELECT total_sales FROM daily_sales WHERE sale_date = ?", (day or today(),))
+    row = cursor.fetchone()
+    return row[0] if row else 0.0
@@ -0,0 +1,177 @@
+"""Open tabs: many in-progress orders at once, keyed by table, that survive a restart.
+
+Each tab is a BillingService session, so a tab costs one OpenOrder (a dict
+of slotted OrderLines) and switching tables is a dict lookup. Every line
+change is sent to a writer thread as one delta: a row upsert or delete in
+open_tab_lines. The till never rewrites a whole tab and never waits on
+the database. On start-up, recover() rebuilds every tab from those rows,
+using the names and prices as they were rung up.
+
+Closing a tab is an ordinary checkout (journal, database, kitchen
+tickets). The order carries the tab's name and closing time, and the
+transaction that stores it deletes the tab's rows added before then, so
+a stored order and its tab's rows never exist together. While the order
+is still only in the order journal (the database was down, or the till
+stopped first), recover() is given the journal and skips those rows. A
+billed tab is therefore never reopened.
+"""
+import queue
+import sqlite3
+import threading
+import time
+
+from utils import db_pool, repository
+
+OPEN_TABS_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS open_tab_lines (
+        tab TEXT NOT NULL,
+        item_id INTEGER NOT NULL,
+        name TEXT,
+        category TEXT,
+        price REAL,
+        gst_percent REAL,
+        quantity INTEGER NOT NULL,
+        added_at REAL NOT NULL,
+        PRIMARY KEY (tab, item_id)
+    ) WITHOUT ROWID
+    """,
+)
+
+RETRY_DELAY = 1.0       # seconds between attempts while the database refuses tab deltas
+
+
+def setup_open_tabs(cursor):
+    for stmt in OPEN_TABS_DDL:
+        cursor.execute(stmt)
+
+
+def setup_tab_journal_ids(cursor):
+    """Migration step, now empty: it added a journal_id mark to open_tab_lines.
+
+    Storing an order now deletes its tab's rows (order_writer), so the mark
+    is no longer written. The step stays so later steps keep their numbers.
+    """
+
+
+class TabManager:
+    """Tabs (table name -> open order) on top of a BillingService."""
+
+    def __init__(self, billing, db_path=None):
+        self.billing = billing
+        self.db_path = db_path
+        self._tabs = {}             # tab -> session id
+        self._listeners = {}        # tab -> OpenOrder listener that records deltas
+        self._deltas = queue.SimpleQueue()
+        self._recovering = False
+        self.last_error = None
+        threading.Thread(target=self._write_deltas, name="tab-writer", daemon=True).start()
+
+    # ---------------------- TABS ----------------------
+
+    def open(self, tab):
+        """The tab's session id, opening the tab if needed."""
+        sid = self._tabs.get(tab)
+        if sid is None:
+            sid = self._tabs[tab] = self.billing.open_session()
+            listener = self._listeners[tab] = lambda event, index, line: self._record(tab, event, line)
+            self.order(tab).subscribe(listener)
+        return sid
+
+    def session(self, tab):
+        return self._tabs[tab]
+
+    def order(self, tab):
+        return self.billing.get_session(self._tabs[tab]).order
+
+    def __contains__(self, tab):
+        return tab in self._tabs
+
+    def tabs(self):
+        return sorted(self._tabs)
+
+    def summary(self):
+        """[(tab, lines, total)] for every open tab."""
+        return [(tab, len(self.order(tab)), self.order(tab).totals()['total']) for tab in self.tabs()]
+
+    def close(self, tab, order_type="Dine-In", payment_method="Cash", discount_percent=0.0):
+        """Check the tab out through BillingService and drop it; returns the checkout result."""
+        result = self.billing.checkout(self._tabs[tab], order_type, payment_method, discount_percent, tab=tab)
+        self._forget(tab)
+        return result
+
+    def discard(self, tab):
+        """Drop a tab without billing it."""
+        if tab in self._tabs:
+            self.order(tab).clear()
+            self._forget(tab)
+
+    def _forget(self, tab):
+        sid = self._tabs.pop(tab)
+        self.billing.get_session(sid).order.unsubscribe(self._listeners.pop(tab))
+        self.billing.close_session(sid)
+
+    # ---------------------- PERSISTENCE ----------------------
+
+    def recover(self, conn=None, journal=None):
+        """Reopen the tabs saved in open_tab_lines; returns their names.
+
+        Pass the till's OrderJournal: rows of a tab closed by an order still
+        waiting there are skipped (storing that order deletes them).
+        """
+        closed = {}     # tab -> when its last pending order closed it
+        for order in journal.pending_orders() if journal is not None else ():
+            if order.get('tab') is not None:
+                closed[order['tab']] = max(closed.get(order['tab'], 0), order['tab_closed_at'])
+        self._recovering = True
+        try:
+            for tab, item_id, name, category, price, gst_percent, quantity, added_at in \
+                    repository.open_tab_lines(conn or db_pool.get_connection(self.db_path)):
+                if added_at <= closed.get(tab, 0):
+                    continue
+                self.open(tab)
+                self.order(tab).add({'id': item_id, 'name': name, 'category': category, 'price': price,
+                                     'gst_percent': gst_percent}, quantity)
+        finally:
+            self._recovering = False
+        return self.tabs()
+
+    def _record(self, tab, event, line):
+        if self._recovering:
+            return
+        if event in ("insert", "update"):
+            self._deltas.put(('tab_line_set', (tab, line.id, line.name, line.category, line.price,
+                                               line.gst_percent, line.quantity, time.time())))
+        elif event == "delete":
+            self._deltas.put(('tab_line_delete', (tab, line.id)))
+        elif event == "clear":
+            self._deltas.put(('tab_clear', (tab,)))
+
+    def _write_deltas(self):
+        conn = db_pool.get_connection(self.db_path)
+        while True:
+            batch = [self._deltas.get()]
+            while True:
+                try:
+                    batch.append(self._deltas.get_nowait())
+                except queue.Empty:
+                    break
+            changes = [entry for entry in batch if entry[0] is not None]
+            while changes:
+                try:
+                    repository.apply_tab_changes(changes, conn)
+                    self.last_error = None
+                    break
+                except sqlite3.Error as e:
+                    # keep the deltas, in order, until the database takes them
+                    self.last_error = e
+                    time.sleep(RETRY_DELAY)
+            for key, flushed in batch:
+                if key is None:
+                    flushed.set()
+
+    def flush(self, timeout=None):
+        """Wait until every delta recorded so far is written; False on timeout."""
+        flushed = threading.Event()
+        self._deltas.put((None, flushed))
+        return flushed.wait(timeout)